@@ -1,23 +1,151 @@
-from google import genai
-from dotenv import load_dotenv
+import asyncio
+import hashlib
 import os
+import random
+import time
+from types import SimpleNamespace
+
+from dotenv import load_dotenv
+
+import metrics
+import model_registry
+import result_cache
 
 load_dotenv()
 API_KEY = os.getenv("API_KEY")
-client = genai.Client(api_key=API_KEY)
+MODEL = "gemini-2.0-flash"
+REQUEST_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
 
-def generate_text(prompt: str) -> str:
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt
-    )
+NO_POSITIVE_REVIEWS = "(لا توجد مراجعات إيجابية لتحليلها)"
+NO_NEGATIVE_REVIEWS = "(لا توجد مراجعات سلبية لتحليلها)"
+
+
+class StubClient:
+    """Offline stand-in for genai.Client with the same models/aio.models surface.
+
+    Returns a canned answer after ``latency`` seconds; select it with
+    GEMINI_CLIENT=stub or pass it to set_client() in tests and benchmarks.
+    """
+
+    def __init__(self, latency=0.0, text="- نقطة"):
+        self.latency = latency
+        self.text = text
+        self.calls = 0
+        self.models = SimpleNamespace(generate_content=self._generate)
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._generate_async))
+
+    def _generate(self, model, contents, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return SimpleNamespace(text=self.text)
+
+    async def _generate_async(self, model, contents, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(text=self.text)
+
+
+@model_registry.register("gemini_client")
+def _load_client():
+    if os.getenv("GEMINI_CLIENT") == "stub":
+        return StubClient()
+    from google import genai
+    from google.genai import types
+    return genai.Client(api_key=API_KEY, http_options=types.HttpOptions(timeout=int(REQUEST_TIMEOUT * 1000)))
+
+
+_client_override = None
+
+
+def set_client(client):
+    """Use ``client`` instead of the registry's Gemini client (None restores the default)."""
+    global _client_override
+    _client_override = client
+
+
+def get_client():
+    return _client_override if _client_override is not None else model_registry.get("gemini_client")
+
+
+# ------------------ 💾 Response cache ------------------
+# Responses are stored in the media result store keyed by sha256(prompt) and the model name,
+# so reruns over the same review set do not call Gemini again.
+def _prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def _cached_response(prompt, model):
+    store = result_cache.default_store()
+    return store.get(_prompt_hash(prompt), model) if store is not None else None
+
+
+def _store_response(prompt, model, text):
+    store = result_cache.default_store()
+    if store is not None and text:
+        store.put(_prompt_hash(prompt), model, "gemini", text)
+
+
+def _backoff(attempt):
+    return min(30.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+# ------------------ 🔁 Sync and async requests ------------------
+def generate_text(prompt: str, model: str = MODEL, client=None, use_cache=True) -> str:
+    if use_cache:
+        cached = _cached_response(prompt, model)
+        if cached is not None:
+            return cached
+
+    client = client or get_client()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with metrics.track("gemini"):
+                response = client.models.generate_content(
+                    model=model,
+                    contents=prompt
+                )
+            break
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                raise
+            print(f"[ERROR] Gemini request failed ({e!r}), retrying")
+            time.sleep(_backoff(attempt))
+
+    if use_cache:
+        _store_response(prompt, model, response.text)
     return response.text
 
 
-def generate_positive_points(reviews: list[str]) -> str:
-    if not reviews:
-        return "(لا توجد مراجعات إيجابية لتحليلها)"
+async def generate_text_async(prompt: str, model: str = MODEL, client=None, use_cache=True, timeout=REQUEST_TIMEOUT) -> str:
+    if use_cache:
+        cached = await asyncio.to_thread(_cached_response, prompt, model)
+        if cached is not None:
+            return cached
+
+    client = client or get_client()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            if hasattr(client, "aio"):
+                request = client.aio.models.generate_content(model=model, contents=prompt)
+            else:
+                request = asyncio.to_thread(client.models.generate_content, model=model, contents=prompt)
+            with metrics.track("gemini"):
+                response = await asyncio.wait_for(request, timeout)
+            break
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                raise
+            print(f"[ERROR] Gemini request failed ({e!r}), retrying")
+            await asyncio.sleep(_backoff(attempt))
+
+    if use_cache:
+        await asyncio.to_thread(_store_response, prompt, model, response.text)
+    return response.text
+
 
+# ------------------ 📝 Prompts ------------------
+def build_positive_prompt(reviews: list[str]) -> str:
     reviews_text = "\n".join([f"- {r}" for r in reviews])
 
     prompt = f"""
@@ -37,14 +165,10 @@ def generate_positive_points(reviews: list[str]) -> str:
 المراجعات:
 {reviews_text}
 """
-    output = generate_text(prompt)
-    return output
-
+    return prompt
 
-def generate_negative_points(reviews: list[str]) -> str:
-    if not reviews:
-        return "(لا توجد مراجعات سلبية لتحليلها)"
 
+def build_negative_prompt(reviews: list[str]) -> str:
     reviews_text = "\n".join([f"- {r}" for r in reviews])
 
     prompt = f"""
@@ -64,5 +188,37 @@ def generate_negative_points(reviews: list[str]) -> str:
 المراجعات:
 {reviews_text}
 """
-    output = generate_text(prompt)
+    return prompt
+
+
+def generate_positive_points(reviews: list[str]) -> str:
+    if not reviews:
+        return NO_POSITIVE_REVIEWS
+
+    output = generate_text(build_positive_prompt(reviews))
+    return output
+
+
+def generate_negative_points(reviews: list[str]) -> str:
+    if not reviews:
+        return NO_NEGATIVE_REVIEWS
+
+    output = generate_text(build_negative_prompt(reviews))
     return output
+
+
+async def generate_points_async(positive_reviews: list[str], negative_reviews: list[str]) -> tuple[str, str]:
+    """Request the positive and negative summaries concurrently."""
+    async def summarize(reviews, build_prompt, empty_message):
+        if not reviews:
+            return empty_message
+        return await generate_text_async(build_prompt(reviews))
+
+    return await asyncio.gather(
+        summarize(positive_reviews, build_positive_prompt, NO_POSITIVE_REVIEWS),
+        summarize(negative_reviews, build_negative_prompt, NO_NEGATIVE_REVIEWS),
+    )
+
+
+def generate_points(positive_reviews: list[str], negative_reviews: list[str]) -> tuple[str, str]:
+    return tuple(asyncio.run(generate_points_async(positive_reviews, negative_reviews)))
@@ -0,0 +1,75 @@
+import threading
+
+
+def split_windows(ids, window, stride):
+    """Split token ids into windows of at most ``window`` tokens, each starting ``stride`` after the previous."""
+    if len(ids) <= window:
+        return [ids]
+    starts = list(range(0, len(ids) - window, stride)) + [len(ids) - window]
+    return [ids[start:start + window] for start in starts]
+
+
+def plan_batches(lengths, token_budget, max_batch_size):
+    """Group item indices into batches sorted by length.
+
+    A batch is padded to its longest item, so it is closed once
+    ``size * longest`` would exceed ``token_budget`` or it holds
+    ``max_batch_size`` items. Items longer than the budget get a batch of
+    their own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, current, longest = [], [], 0
+    for i in order:
+        longest_if_added = max(longest, lengths[i])
+        if current and (len(current) >= max_batch_size or (len(current) + 1) * longest_if_added > token_budget):
+            batches.append(current)
+            current, longest_if_added = [], lengths[i]
+        current.append(i)
+        longest = longest_if_added
+    if current:
+        batches.append(current)
+    return batches
+
+
+def padded_tokens(lengths, batches):
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
+
+class BatchStats:
+    """Running padding and throughput counters for an encoder."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.windows = 0
+        self.batches = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+        self.unsorted_padded_tokens = 0
+        self.seconds = 0.0
+
+    def record(self, documents, lengths, batches, unsorted_batch_size, seconds):
+        unsorted = [list(range(i, min(i + unsorted_batch_size, len(lengths))))
+                    for i in range(0, len(lengths), unsorted_batch_size)]
+        with self._lock:
+            self.documents += documents
+            self.windows += len(lengths)
+            self.batches += len(batches)
+            self.tokens += sum(lengths)
+            self.padded_tokens += padded_tokens(lengths, batches)
+            self.unsorted_padded_tokens += padded_tokens(lengths, unsorted)
+            self.seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": self.documents,
+                "windows": self.windows,
+                "batches": self.batches,
+                "tokens": self.tokens,
+                # Share of encoded positions that are real tokens rather than padding
+                "padding_efficiency": self.tokens / self.padded_tokens if self.padded_tokens else 1.0,
+                "unsorted_padding_efficiency": self.tokens / self.unsorted_padded_tokens if self.unsorted_padded_tokens else 1.0,
+                "tokens_per_s": self.tokens / self.seconds if self.seconds else 0.0,
+                "documents_per_s": self.documents / self.seconds if self.seconds else 0.0,
+            }
@@ -0,0 +1,117 @@
+"""Seeded synthetic Arabic review corpora for the benchmarks.
+
+Reviews mix MSA and Egyptian, Gulf and Levantine phrasing with negations,
+elongated letters, diacritics, tatweel, emojis, Western and Arabic-Indic
+digits and the odd English word, in roughly the proportions seen in app-store
+exports. The same seed always gives the same corpus.
+
+    python benchmarks/corpus.py --items 100000 --seed 0 -o reviews_100k.jsonl
+"""
+import argparse
+import json
+import random
+
+SUBJECTS = [
+    "المنتج", "التطبيق", "الخدمة", "التوصيل", "المطعم", "الأكل", "الموظفين", "السعر", "الجودة", "التغليف",
+    "الدعم الفني", "الطلب", "المندوب", "الفندق", "الغرفة", "التحديث الجديد", "الشحن", "الكاشير", "العرض", "البرنامج",
+]
+POSITIVE = [
+    "ممتاز", "رائع", "حلو", "جميل جدا", "يجنن", "تحفة", "مرة حلو", "كتير منيح", "زاكي", "سريع",
+    "نظيف", "محترم", "يستاهل", "أنصح فيه", "فوق الممتاز", "خرافي", "يهبل", "واو", "ممتازة", "عجبني",
+]
+NEGATIVE = [
+    "سيء", "وحش", "زفت", "بطيء", "غالي", "مو زين", "خربان", "مقرف", "تعبان", "ضعيف",
+    "ما يستاهل", "مش كويس", "بايخ", "مزعج", "فاشل", "متأخر", "بارد", "ناقص", "غلط", "مضيعة وقت",
+]
+NEGATIONS = ["مش", "ما", "لا", "مو", "مفيش", "غير", "ليس", "ماعنديش"]
+FILLERS = [
+    "والله", "بصراحة", "جدا", "كثير", "شوية", "خالص", "اوي", "مرة", "يعني", "صراحة", "للأسف", "الحمد لله",
+    "من أول يوم", "كل مرة", "هذي المرة", "بعد التحديث", "مع الأسف", "على طول", "في الوقت", "بالمرة",
+]
+ENGLISH = ["app", "delivery", "ok", "nice", "bad", "service", "update", "wow"]
+EMOJIS = ["👍", "👎", "😍", "😡", "😂", "❤️", "💔", "🔥", "😢", "🙏", "👌", "😤", "⭐", "🤮", "😊"]
+DIACRITICS = "ًٌٍَُِّْ"
+TATWEEL = "ـ"
+WESTERN_DIGITS = "0123456789"
+ARABIC_DIGITS = "٠١٢٣٤٥٦٧٨٩"
+
+
+def _decorate(word, rng):
+    roll = rng.random()
+    if roll < 0.05 and len(word) > 2:
+        # Elongation: رائع → راااائع
+        i = rng.randrange(1, len(word) - 1)
+        return word[:i] + word[i] * rng.randint(2, 6) + word[i + 1:]
+    if roll < 0.09:
+        return "".join(ch + (rng.choice(DIACRITICS) if rng.random() < 0.4 else "") for ch in word)
+    if roll < 0.12 and len(word) > 2:
+        i = rng.randrange(1, len(word))
+        return word[:i] + TATWEEL * rng.randint(1, 4) + word[i:]
+    return word
+
+
+def _number(rng):
+    digits = ARABIC_DIGITS if rng.random() < 0.5 else WESTERN_DIGITS
+    return "".join(rng.choice(digits) for _ in range(rng.randint(1, 4)))
+
+
+def review(rng, long_rate=0.02):
+    """One synthetic review; ``long_rate`` of them run to several sentences."""
+    sentences = rng.randint(3, 12) if rng.random() < long_rate else 1
+    parts = []
+    for _ in range(sentences):
+        positive = rng.random() < 0.6
+        words = [rng.choice(SUBJECTS)]
+        if rng.random() < 0.15:
+            words.append(rng.choice(NEGATIONS))
+        words.append(rng.choice(POSITIVE if positive else NEGATIVE))
+        for _ in range(rng.randint(0, 4)):
+            roll = rng.random()
+            if roll < 0.6:
+                words.append(rng.choice(FILLERS))
+            elif roll < 0.75:
+                words.append(_number(rng))
+            elif roll < 0.85:
+                words.append(rng.choice(ENGLISH))
+            else:
+                words.append(rng.choice(POSITIVE if positive else NEGATIVE))
+        rng.shuffle(words)
+        text = " ".join(_decorate(w, rng) for w in words)
+        if rng.random() < 0.35:
+            text += " " + rng.choice(EMOJIS) * rng.randint(1, 3)
+        if rng.random() < 0.3:
+            text += rng.choice(["!", "!!", "؟", ".", "...", "،"])
+        parts.append(text)
+    return " ".join(parts)
+
+
+def generate_reviews(items, seed=0, duplicate_rate=0.1, long_rate=0.02):
+    """``items`` reviews; ``duplicate_rate`` of them repeat an earlier review verbatim."""
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(items):
+        if reviews and rng.random() < duplicate_rate:
+            reviews.append(rng.choice(reviews))
+        else:
+            reviews.append(review(rng, long_rate))
+    return reviews
+
+
+def write_jsonl(reviews, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for text in reviews:
+            f.write(json.dumps({"comment": text}, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("-o", "--output", default="reviews.jsonl")
+    args = parser.parse_args()
+    write_jsonl(generate_reviews(args.items, args.seed, args.duplicate_rate), args.output)
+
+
+if __name__ == "__main__":
+    main()
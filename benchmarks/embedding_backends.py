@@ -0,0 +1,112 @@
+"""Validate the ONNX embedding backends against fp32 PyTorch before switching EMBED_BACKEND.
+
+    python benchmarks/embedding_backends.py --export
+    python benchmarks/embedding_backends.py --data reviews.jsonl --backends torch onnx onnx-int8
+
+``--data`` is a JSON/JSONL review export; when its comments carry a ``label``
+(or ``sentiment``) field the XGBoost accuracy against it is reported as well.
+Without labels, predictions are compared with the fp32 ones. Prints one JSON
+object per backend with cosine agreement, prediction agreement and tokens/s.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from embedding import BACKENDS, DEFAULT_BATCH_SIZE, ONNX_DIR, export_onnx, load_sentence_model, require_onnx
+from model_ml import InferenceEngine
+from preprocessing import preprocess_batch
+
+POSITIVE_LABELS = {"1", "positive", "pos"}
+
+
+def load_reviews(path, limit):
+    with open(path, encoding="utf-8-sig") as f:
+        if path.lower().endswith(".jsonl"):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            document = json.load(f)
+            records = document.get("reviews", []) if isinstance(document, dict) else document
+
+        texts, labels = [], []
+        for record in records:
+            if not isinstance(record, dict) or not str(record.get("comment", "") or "").strip():
+                continue
+            label = record.get("label", record.get("sentiment"))
+            texts.append(str(record["comment"]).strip())
+            labels.append(None if label is None else int(str(label).lower() in POSITIVE_LABELS))
+            if len(texts) >= limit:
+                break
+    return texts, labels if labels and all(label is not None for label in labels) else None
+
+
+def encode(model, texts, batch_size):
+    # preprocess() returns None for non-Arabic text; embed_batch encodes those as empty strings
+    texts = [t if t is not None else "" for t in texts]
+    model.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    seconds = time.perf_counter() - start
+    tokens = sum(len(ids) for ids in model.tokenizer(texts, truncation=True)["input_ids"])
+    return np.asarray(vectors, dtype=np.float32), seconds, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", help="JSON/JSONL review export")
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--model", default=os.path.join(ROOT, "xgb_model.json"))
+    parser.add_argument("--export", action="store_true", help=f"export the ONNX and int8 models to {ONNX_DIR} and exit")
+    args = parser.parse_args()
+
+    if args.export:
+        print(json.dumps({"exported": export_onnx()}))
+        return
+    if not args.data:
+        parser.error("--data is required unless --export is given")
+    # Fail before the fp32 reference run rather than after it
+    for backend in args.backends:
+        if backend != "torch":
+            require_onnx(backend)
+
+    reviews, labels = load_reviews(args.data, args.limit)
+    if not reviews:
+        sys.exit(f"No reviews found in {args.data}")
+    texts = preprocess_batch(reviews)
+    engine = InferenceEngine(args.model)
+
+    reference = reference_preds = None
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        vectors, seconds, tokens = encode(load_sentence_model(backend), texts, args.batch_size)
+        preds = engine.predict(vectors)
+        if reference is None:
+            reference, reference_preds = vectors, preds
+
+        a = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+        b = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        cosine = np.sum(a * b, axis=1)
+        result = {
+            "backend": backend,
+            "items": len(texts),
+            "cosine_mean": float(cosine.mean()),
+            "cosine_min": float(cosine.min()),
+            "prediction_agreement": float(np.mean(preds == reference_preds)),
+            "tokens_per_s": tokens / seconds,
+            "items_per_s": len(texts) / seconds,
+        }
+        if labels is not None:
+            result["accuracy"] = float(np.mean(preds == np.asarray(labels)))
+        if backend == "torch" and "torch" not in args.backends:
+            continue
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
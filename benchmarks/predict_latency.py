@@ -0,0 +1,61 @@
+"""Compare XGBClassifier.predict with the inplace_predict engine across batch sizes.
+
+    python benchmarks/predict_latency.py --batch-sizes 1 32 1024 65536 --nthread 4
+
+Prints one JSON object per (path, batch size) with median latency and rows/s.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from model_ml import InferenceEngine, load_model
+
+
+def time_call(fn, X, repeats):
+    fn(X)  # warm-up
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=os.path.join(ROOT, "xgb_model.json"))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 256, 4096, 65536])
+    parser.add_argument("--nthread", type=int, default=0, help="0 lets xgboost use every core")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    classifier = load_model(args.model)
+    engine = InferenceEngine(args.model, nthread=args.nthread)
+    dim = engine.booster.num_features()
+    rng = np.random.default_rng(args.seed)
+
+    for batch_size in args.batch_sizes:
+        X = rng.standard_normal((batch_size, dim), dtype=np.float32)
+        if not np.array_equal(classifier.predict(X), engine.predict(X)):
+            sys.exit(f"Engine labels differ from XGBClassifier.predict at batch size {batch_size}")
+
+        for name, fn in (("XGBClassifier.predict", classifier.predict), ("InferenceEngine.predict_proba", engine.predict_proba)):
+            seconds = time_call(fn, X, args.repeats)
+            print(json.dumps({
+                "path": name,
+                "batch_size": batch_size,
+                "median_ms": seconds * 1000,
+                "rows_per_s": batch_size / seconds,
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Check that preprocessing.preprocess_batch matches preprocessing.preprocess.
+
+Runs hand-picked edge cases plus a seeded random corpus mixing Arabic letters,
+hamza forms, ligatures, diacritics, tatweel, emojis, digits and punctuation,
+then reports the speed of both paths.
+
+    python benchmarks/preprocess_parity.py --items 50000 --seed 0
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import emoji
+from preprocessing import preprocess, preprocess_batch, emoji_arabic_map
+
+EDGE_CASES = [
+    "",
+    " ",
+    "hello world",
+    "ممتاز 👍",
+    "👍",
+    "❤️❤️ حلو",
+    "آمن",
+    "آمّ",
+    "آمن جدا",
+    "آﻻم",
+    "ﻻ اعرف",
+    "الْعَرَبِيّةُ",
+    "العـــــربية",
+    "مش حلو خالص",
+    "ما عجبني",
+    "مفيش خدمة 123",
+    "سعر ٥٠ جنيه و 20 دولار",
+    "إسلام أحمد ٱلله",
+    "مدرسة مستشفى",
+    "گ ڤ ڨ چ پ",
+    "جاء سؤال الأئمة عن الإسلام آجلا",
+    "!!! رائع، جداً؟ «نعم»",
+    "abc مش",
+]
+
+ALPHABET = (
+    "ابتثجحخدذرزسشصضطظعغفقكلمنهويىة"
+    "ءؤئإأآٱ"
+    "ﻻﻷﻹﻵ"
+    "ًٌٍَُِّْـ"
+    "گڤڨچپ"
+    "0123456789٠١٢٣٤٥٦٧٨٩"
+    "!?.,،؛؟«»-_[]\\^"
+    "abcxyz"
+)
+WORDS = ["مش", "ما", "لا", "غير", "مو", "مفيش", "محدش", "ليس", "ماعند", "ماعنديش", "حلو", "وحش"]
+
+
+def random_text(rng, emojis):
+    parts = []
+    for _ in range(rng.randint(0, 12)):
+        roll = rng.random()
+        if roll < 0.2:
+            parts.append(rng.choice(WORDS))
+        elif roll < 0.35:
+            parts.append(rng.choice(emojis))
+        else:
+            parts.append("".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 8))))
+    return rng.choice([" ", "", "  "]).join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    emojis = sorted(emoji_arabic_map) + rng.sample(sorted(emoji.EMOJI_DATA), 200)
+    corpus = EDGE_CASES + [random_text(rng, emojis) for _ in range(args.items)]
+
+    start = time.perf_counter()
+    expected = [preprocess(t) for t in corpus]
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = preprocess_batch(corpus, processes=args.processes)
+    batch_seconds = time.perf_counter() - start
+
+    mismatches = [(t, e, a) for t, e, a in zip(corpus, expected, actual) if e != a]
+    print(json.dumps({
+        "items": len(corpus),
+        "mismatches": len(mismatches),
+        "preprocess_items_per_s": len(corpus) / reference_seconds,
+        "preprocess_batch_items_per_s": len(corpus) / batch_seconds,
+        "speedup": reference_seconds / batch_seconds,
+    }, indent=2))
+
+    for text, exp, got in mismatches[:10]:
+        print(f"MISMATCH {text!r}\n  preprocess:       {exp!r}\n  preprocess_batch: {got!r}", file=sys.stderr)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
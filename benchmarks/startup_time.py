@@ -0,0 +1,86 @@
+"""Measure how long the dashboard's top-level imports take on a cold interpreter.
+
+The module list is read from main.py itself, so this keeps tracking the real
+startup path as imports change. Each run uses a fresh subprocess.
+
+    python benchmarks/startup_time.py --runs 5 --budget 3.0
+
+Prints one JSON object and exits non-zero when the median exceeds --budget or
+when a heavy backend is imported at startup, so it can gate CI.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Backends that must only be imported once a file of the matching modality arrives
+HEAVY_MODULES = ["torch", "torchaudio", "nemo", "easyocr", "transformers", "sentence_transformers", "moviepy", "google.genai"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def startup_imports(path):
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def measure(modules, runs):
+    code = PROBE.format(modules=modules, heavy=HEAVY_MODULES)
+    samples = []
+    heavy = set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+        if out.returncode != 0:
+            sys.exit(f"Import probe failed:\n{out.stderr}")
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        heavy.update(result["heavy"])
+    return samples, sorted(heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=None, help="fail when the median import time exceeds this many seconds")
+    args = parser.parse_args()
+
+    modules = startup_imports(os.path.join(ROOT, "main.py"))
+    samples, heavy = measure(modules, args.runs)
+    report = {
+        "modules": modules,
+        "runs": args.runs,
+        "median_seconds": statistics.median(samples),
+        "min_seconds": min(samples),
+        "max_seconds": max(samples),
+        "heavy_modules_loaded": heavy,
+    }
+    print(json.dumps(report, indent=2))
+
+    if heavy:
+        sys.exit(f"Heavy backends imported at startup: {', '.join(heavy)}")
+    if args.budget is not None and report["median_seconds"] > args.budget:
+        sys.exit(f"Startup took {report['median_seconds']:.2f}s, budget is {args.budget:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Stage and end-to-end benchmarks on synthetic Arabic review corpora.
+
+Times preprocessing.preprocess / preprocess_batch, embedding.embed_batch,
+model_ml.predict and pipeline.analyze_paths at each corpus size. ASR, OCR and
+Gemini are replaced by stubs with a fixed latency so results only move when
+our own code does; --stub-embed also swaps the sentence encoder for seeded
+random vectors when the model is not available.
+
+    python benchmarks/suite.py --sizes 1000 100000 1000000 -o bench.json
+    python benchmarks/suite.py --sizes 1000 100000 --compare bench.json
+
+Writes one JSON document (run metadata plus one record per size and stage).
+With --compare, prints the speed ratio against an earlier run and exits
+non-zero when a stage got slower than --tolerance allows.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Caches would turn repeat runs into lookups; every stage is measured cold
+os.environ.setdefault("EMBED_CACHE_DIR", "")
+os.environ.setdefault("MEDIA_CACHE_DIR", "")
+
+import numpy as np
+from corpus import generate_reviews, review, write_jsonl
+
+FILE_ITEMS = 50000  # reviews per generated JSONL export
+
+
+# ============================================
+# 1. Stub backends
+# ============================================
+def install_media_stubs(latency, seed):
+    """Replace image_model and vid_model with modules that return synthetic text after ``latency`` seconds."""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def fake_text(_media, on_partial=None):
+        time.sleep(latency)
+        with lock:
+            return " ".join(review(rng) for _ in range(3))
+
+    image_model = types.ModuleType("image_model")
+    image_model.arabic_text_from_image = fake_text
+    image_model.arabic_texts_from_images = lambda images: [fake_text(image) for image in images]
+    vid_model = types.ModuleType("vid_model")
+    vid_model.get_transcript = fake_text
+    sys.modules["image_model"] = image_model
+    sys.modules["vid_model"] = vid_model
+
+
+def install_embedding_stub(dim=384):
+    embedding = types.ModuleType("embedding")
+    embedding.EMBEDDING_DIM = dim
+
+    def embed_batch(texts, batch_size=64):
+        vectors = np.empty((len(texts), dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vectors[i] = np.random.default_rng(zlib.crc32((text or "").encode("utf-8"))).standard_normal(dim)
+        return vectors
+
+    embedding.embed_batch = embed_batch
+    embedding.embed = lambda text: embed_batch([text])[0]
+    sys.modules["embedding"] = embedding
+
+
+def install_gemini_stub(latency):
+    import Text_Generation
+    Text_Generation.set_client(Text_Generation.StubClient(latency=latency))
+
+
+# ============================================
+# 2. Stages
+# ============================================
+def timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples)
+
+
+def record(results, size, stage, items, seconds, **extra):
+    entry = dict(size=size, stage=stage, items=items, seconds=seconds, items_per_s=items / seconds if seconds else None, **extra)
+    results.append(entry)
+    print(f"{size:>9} {stage:<20} {items:>9} items {seconds:9.3f}s", file=sys.stderr)
+
+
+def bench_stages(results, size, reviews, args):
+    from preprocessing import preprocess, preprocess_batch
+    import embedding
+    from model_ml import predict
+
+    single = reviews[:args.single_items]
+    record(results, size, "preprocess", len(single), timed(lambda: [preprocess(t) for t in single], args.repeats))
+
+    processed = preprocess_batch(reviews)
+    record(results, size, "preprocess_batch", len(reviews), timed(lambda: preprocess_batch(reviews), args.repeats))
+
+    to_embed = processed[:args.embed_items]
+
+    def embed():
+        if hasattr(embedding, "cache"):
+            embedding.cache.clear_memory()
+        return embedding.embed_batch(to_embed)
+
+    vectors = embed()
+    record(results, size, "embed", len(to_embed), timed(embed, args.repeats))
+
+    X = np.resize(vectors, (size, vectors.shape[1]))
+    predict(X[:1])  # load the model outside the timing
+    record(results, size, "predict", size, timed(lambda: predict(X), args.repeats))
+
+
+def bench_end_to_end(results, size, reviews, args):
+    import metrics
+    from pipeline import analyze_paths
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(0, len(reviews), FILE_ITEMS):
+            path = os.path.join(tmp, f"reviews_{i // FILE_ITEMS:04d}.jsonl")
+            write_jsonl(reviews[i:i + FILE_ITEMS], path)
+            paths.append(path)
+        for i in range(args.media_files):
+            path = os.path.join(tmp, f"note_{i}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(reviews[i % len(reviews)])
+            paths.append(path)
+        # Empty media files: the stubs ignore their contents
+        for name in [f"image_{i}.jpg" for i in range(args.media_files)] + [f"video_{i}.mp4" for i in range(args.media_files)]:
+            open(os.path.join(tmp, name), "wb").close()
+            paths.append(os.path.join(tmp, name))
+
+        start = time.perf_counter()
+        result = analyze_paths(paths, summarize=True, stages=metrics.Metrics())
+        seconds = time.perf_counter() - start
+
+    record(results, size, "end_to_end", result["total"], seconds, files=len(paths),
+           stages={stage: {k: entry[k] for k in ("seconds", "calls", "items")} for stage, entry in result["stages"].items()})
+
+
+# ============================================
+# 3. Reporting
+# ============================================
+def run_metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "stubs": ["asr", "ocr", "gemini"] + (["embedding"] if args.stub_embed else []),
+        "args": vars(args),
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Print current/baseline throughput per (size, stage); return the regressions."""
+    before = {(r["size"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for entry in current["results"]:
+        old = before.get((entry["size"], entry["stage"]))
+        if not old or not old["items_per_s"] or not entry["items_per_s"]:
+            continue
+        ratio = entry["items_per_s"] / old["items_per_s"]
+        flag = ""
+        if ratio < 1 - tolerance:
+            flag = "  REGRESSION"
+            regressions.append((entry["size"], entry["stage"], ratio))
+        print(f"{entry['size']:>9} {entry['stage']:<20} {ratio:6.2f}x{flag}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3, help="best of N for the per-stage timings")
+    parser.add_argument("--single-items", type=int, default=100000, help="cap for the one-at-a-time preprocess loop")
+    parser.add_argument("--embed-items", type=int, default=20000, help="cap for the embedding stage")
+    parser.add_argument("--e2e-max-items", type=int, default=100000, help="largest size run end to end")
+    parser.add_argument("--media-files", type=int, default=4, help="stubbed images, videos and .txt files per end-to-end run")
+    parser.add_argument("--media-latency", type=float, default=0.05, help="seconds per stubbed OCR/ASR call")
+    parser.add_argument("--gemini-latency", type=float, default=0.2, help="seconds per stubbed Gemini call")
+    parser.add_argument("--stub-embed", action="store_true", help="use seeded random vectors instead of the encoder")
+    parser.add_argument("-o", "--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed throughput drop before --compare fails")
+    args = parser.parse_args()
+
+    install_media_stubs(args.media_latency, args.seed)
+    if args.stub_embed:
+        install_embedding_stub()
+    install_gemini_stub(args.gemini_latency)
+
+    results = []
+    for size in args.sizes:
+        reviews = generate_reviews(size, seed=args.seed)
+        bench_stages(results, size, reviews, args)
+        if size <= args.e2e_max_items:
+            bench_end_to_end(results, size, reviews, args)
+
+    output = {"meta": run_metadata(args), "results": results}
+    text = json.dumps(output, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(output, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import hashlib
+import os
+
+import numpy as np
+
+# Cosine similarity at which two comments count as near-duplicates; 0 disables collapsing
+DEFAULT_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.95"))
+
+
+class NearDuplicateIndex:
+    """Streaming duplicate collapsing over normalized text and e5 embeddings.
+
+    Each item is first matched by a hash of its normalized text, then by cosine
+    similarity against earlier representatives. Candidates come from
+    random-hyperplane LSH buckets, so only a handful of vectors are compared
+    per item. Items without normalized text (non-Arabic comments) all share
+    one embedding, so they are matched on their raw text only. At most
+    ``max_items`` representatives are kept; the oldest are dropped first,
+    but never one the current batch refers to.
+    """
+
+    def __init__(self, dim, threshold=DEFAULT_THRESHOLD, num_tables=6, bits=12, max_items=100000, seed=0):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_items = max_items
+        self.num_tables = num_tables
+
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((num_tables * bits, dim)).astype(np.float32)
+        self._bits = bits
+        self._weights = (1 << np.arange(bits, dtype=np.int64))
+
+        # Storage grows by doubling up to max_items rows
+        capacity = min(1024, max_items)
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._keys = np.zeros((capacity, num_tables), dtype=np.int64)
+        self._indexed = np.zeros(max_items, dtype=bool)
+        self._hashes = [None] * max_items
+        self.labels = [None] * max_items
+        self.sizes = np.zeros(max_items, dtype=np.int64)
+        self._buckets = [{} for _ in range(num_tables)]
+        self._by_hash = {}
+        self._next = 0
+        self._filled = 0
+
+        self.items = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _signatures(self, vectors):
+        bits = (vectors @ self._planes.T) > 0
+        return bits.reshape(len(vectors), self.num_tables, self._bits) @ self._weights
+
+    def _evict(self, slot):
+        if slot >= self._filled:
+            return
+        for table, key in enumerate(self._keys[slot] if self._indexed[slot] else ()):
+            members = self._buckets[table].get(int(key))
+            if members is not None:
+                members.remove(slot)
+                if not members:
+                    del self._buckets[table][int(key)]
+        self._by_hash.pop(self._hashes[slot], None)
+
+    def _grow(self):
+        capacity = min(self.max_items, len(self._vectors) * 2)
+        self._vectors = np.concatenate([self._vectors, np.zeros((capacity - len(self._vectors), self.dim), dtype=np.float32)])
+        self._keys = np.concatenate([self._keys, np.zeros((capacity - len(self._keys), self.num_tables), dtype=np.int64)])
+
+    def _free_slot(self, in_use):
+        # Reusing a slot the batch already handed out would give its earlier
+        # items the new representative's label
+        for _ in range(self.max_items):
+            slot = self._next
+            self._next = (self._next + 1) % self.max_items
+            if slot not in in_use:
+                return slot
+        raise ValueError(f"batch has more than max_items={self.max_items} distinct items")
+
+    def _insert(self, vector, keys, text_hash, in_use):
+        slot = self._free_slot(in_use)
+        if slot >= len(self._vectors):
+            self._grow()
+        self._evict(slot)
+        self._hashes[slot] = text_hash
+        self._indexed[slot] = vector is not None
+        self.labels[slot] = None
+        self.sizes[slot] = 0
+        if vector is not None:
+            self._vectors[slot] = vector
+            self._keys[slot] = keys
+            for table, key in enumerate(keys):
+                self._buckets[table].setdefault(int(key), []).append(slot)
+        self._by_hash[text_hash] = slot
+        self._filled = max(self._filled, slot + 1)
+        return slot
+
+    def assign(self, texts, vectors, raw_texts=None):
+        """Map each item to a representative slot.
+
+        ``texts`` are the normalized texts; where one is None the matching
+        entry of ``raw_texts`` is hashed instead and no similarity search is
+        done. Returns ``(slots, new_slots)``: the slot of every item, and the
+        slots created by this call whose labels the caller must fill in.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        normed = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        signatures = self._signatures(normed)
+
+        slots = np.empty(len(texts), dtype=np.int64)
+        new_slots = []
+        in_use = set()
+        for i, text in enumerate(texts):
+            self.items += 1
+            normalized = text is not None
+            if not normalized:
+                # Prefixed so a raw text never matches an equal normalized one
+                text = "\0" + (raw_texts[i] if raw_texts is not None and raw_texts[i] is not None else "")
+            text_hash = hashlib.blake2b(" ".join(text.split()).encode("utf-8"), digest_size=16).digest()
+            slot = self._by_hash.get(text_hash)
+            if slot is not None:
+                self.exact_duplicates += 1
+            else:
+                slot = self._nearest(normed[i], signatures[i]) if normalized else None
+                if slot is not None:
+                    self.near_duplicates += 1
+                else:
+                    slot = self._insert(normed[i] if normalized else None, signatures[i], text_hash, in_use)
+                    new_slots.append(slot)
+            in_use.add(slot)
+            slots[i] = slot
+            self.sizes[slot] += 1
+        return slots, new_slots
+
+    def _nearest(self, vector, keys):
+        candidates = set()
+        for table, key in enumerate(keys):
+            candidates.update(self._buckets[table].get(int(key), ()))
+        if not candidates:
+            return None
+        candidates = np.fromiter(candidates, dtype=np.int64)
+        sims = self._vectors[candidates] @ vector
+        best = int(np.argmax(sims))
+        return int(candidates[best]) if sims[best] >= self.threshold else None
+
+    def stats(self):
+        return {
+            "items": self.items,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "representatives": self.items - self.exact_duplicates - self.near_duplicates,
+        }
+
+
+def make_index(dim, threshold=DEFAULT_THRESHOLD):
+    return NearDuplicateIndex(dim, threshold=threshold) if threshold > 0 else None
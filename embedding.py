@@ -1,17 +1,156 @@
-import torch
-from sentence_transformers import SentenceTransformer
-from huggingface_hub import login
+import numpy as np
 from dotenv import load_dotenv
 import os
+import time
+
+import model_registry
+from batching import BatchStats, plan_batches, split_windows
+from embedding_cache import EmbeddingCache
 
 load_dotenv()
 SECRET_KEY = os.getenv("HG_KEY")
-login(SECRET_KEY)
+
+MODEL_NAME = "AhmedBadawy11/multilingual-e5-small-finetuned-ar"
+EMBEDDING_DIM = 384
+DEFAULT_BATCH_SIZE = 64
+# Batches are sorted by token length and capped at TOKEN_BUDGET padded tokens.
+# Texts longer than the encoder's max length are split into windows that
+# overlap by WINDOW_OVERLAP tokens and mean-pooled back into one vector.
+TOKEN_BUDGET = int(os.getenv("EMBED_TOKEN_BUDGET", "16384"))
+WINDOW_OVERLAP = int(os.getenv("EMBED_WINDOW_OVERLAP", "64"))
+
+# "torch" (fp32 PyTorch), "onnx" or "onnx-int8" (ONNX Runtime on CPU). The ONNX
+# backends read the export written by benchmarks/embedding_backends.py --export
+# and need the optional ONNX_REQUIREMENT on top of requirements.txt.
+BACKENDS = ("torch", "onnx", "onnx-int8")
+BACKEND = os.getenv("EMBED_BACKEND", "torch")
+ONNX_DIR = os.getenv("EMBED_ONNX_DIR", "./models/e5-small-ar-onnx")
+ONNX_INT8_FILE = "onnx/model_qint8_avx2.onnx"
+ONNX_REQUIREMENT = "sentence-transformers[onnx]==4.1.0"
+
+
+def require_onnx(backend):
+    import importlib.util
+    missing = [name for name in ("optimum", "onnxruntime") if importlib.util.find_spec(name) is None]
+    if missing:
+        raise ImportError(
+            f"The '{backend}' embedding backend needs {' and '.join(missing)}: pip install '{ONNX_REQUIREMENT}'"
+        )
+
+
+def load_sentence_model(backend=BACKEND):
+    # torch, sentence_transformers and the hub login are only pulled in on the first cache miss
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from huggingface_hub import login
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+    if backend != "torch":
+        require_onnx(backend)
+    if SECRET_KEY:
+        login(SECRET_KEY)
+
+    if backend == "torch":
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        model = SentenceTransformer(MODEL_NAME, device=device)
+    elif backend == "onnx":
+        model = SentenceTransformer(ONNX_DIR, backend="onnx", device="cpu")
+    else:
+        model = SentenceTransformer(ONNX_DIR, backend="onnx", device="cpu", model_kwargs={"file_name": ONNX_INT8_FILE})
+
+    dim = model.get_sentence_embedding_dimension()
+    if dim != EMBEDDING_DIM:
+        raise ValueError(f"{MODEL_NAME} produces {dim}-d vectors, expected {EMBEDDING_DIM}")
+    return model
+
+
+def export_onnx(output_dir=ONNX_DIR, quantize=True):
+    """Export the model to ONNX under ``output_dir``, plus an int8 dynamic-quantized copy."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    require_onnx("onnx")
+    model = SentenceTransformer(MODEL_NAME, backend="onnx", device="cpu")
+    model.save_pretrained(output_dir)
+    if quantize:
+        export_dynamic_quantized_onnx_model(model, "avx2", output_dir)
+    return output_dir
 
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model = SentenceTransformer("AhmedBadawy11/multilingual-e5-small-finetuned-ar", device=device)
+@model_registry.register("sentence_embedding")
+def _load_model():
+    return load_sentence_model(BACKEND)
+
+# Vectors from different backends are cached separately; "|pooled" keeps
+# vectors of long texts apart from the ones truncated before windowing.
+# Set EMBED_CACHE_DIR to an empty string to keep the cache in memory only
+cache = EmbeddingCache(
+    (MODEL_NAME if BACKEND == "torch" else f"{MODEL_NAME}@{BACKEND}") + "|pooled",
+    EMBEDDING_DIM,
+    cache_dir=os.getenv("EMBED_CACHE_DIR", "./cache/embeddings"),
+    max_memory_items=int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", "20000")),
+)
+batch_stats = BatchStats()
+
+def _tokenize(model, texts):
+    """Token ids per window, plus the owning document index of each window."""
+    tokenizer = model.tokenizer
+    window = model.max_seq_length - tokenizer.num_special_tokens_to_add()
+    stride = max(1, window - WINDOW_OVERLAP)
+    ids = tokenizer(texts, add_special_tokens=False, truncation=False, verbose=False)["input_ids"]
+
+    windows, owners = [], []
+    for doc, doc_ids in enumerate(ids):
+        for piece in split_windows(doc_ids, window, stride):
+            windows.append(tokenizer.build_inputs_with_special_tokens(piece))
+            owners.append(doc)
+    return windows, owners
+
+
+def _encode(texts, batch_size=DEFAULT_BATCH_SIZE):
+    import torch
+    from sentence_transformers.models import Normalize
+    from sentence_transformers.util import batch_to_device
+
+    model = model_registry.get("sentence_embedding")
+    start = time.perf_counter()
+    windows, owners = _tokenize(model, texts)
+    lengths = [len(w) for w in windows]
+    batches = plan_batches(lengths, TOKEN_BUDGET, batch_size)
+
+    window_vectors = np.empty((len(windows), EMBEDDING_DIM), dtype=np.float32)
+    with torch.inference_mode():
+        for batch in batches:
+            features = model.tokenizer.pad({"input_ids": [windows[i] for i in batch]}, return_tensors="pt")
+            features = batch_to_device(dict(features), model.device)
+            output = model(features)["sentence_embedding"]
+            window_vectors[batch] = output.float().cpu().numpy()
+
+    # Mean-pool the windows of long documents, weighted by their token counts
+    owners = np.asarray(owners)
+    weights = np.asarray(lengths, dtype=np.float32)
+    embeddings = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    np.add.at(embeddings, owners, window_vectors * weights[:, None])
+    embeddings /= np.bincount(owners, weights=weights, minlength=len(texts)).astype(np.float32)[:, None]
+    if any(isinstance(module, Normalize) for module in model):
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    batch_stats.record(len(texts), lengths, batches, batch_size, time.perf_counter() - start)
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
 
 def embed(text):
-    embedding = model.encode(text, convert_to_numpy=True)
-    return embedding
\ No newline at end of file
+    return embed_batch([text])[0]
+
+def embed_batch(texts, batch_size=DEFAULT_BATCH_SIZE):
+    # preprocess() returns None for non-Arabic text, encode those as empty strings
+    texts = [t if t is not None else "" for t in texts]
+    if not texts:
+        return np.empty((0, cache.dim), dtype=np.float32)
+
+    return cache.get_or_compute(texts, lambda missing: _encode(missing, batch_size))
+
+def cache_stats():
+    return cache.stats()
+
+def encode_stats():
+    return batch_stats.stats()
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+
+def cache_key(text, model_name):
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update((text or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by sha256(model name + preprocessed text).
+
+    Hot entries live in a bounded in-memory LRU. When ``cache_dir`` is set,
+    every vector is also appended to a memory-mapped float32 matrix on disk;
+    row ``i`` of ``vectors.f32`` belongs to line ``i`` of ``keys.txt``. The
+    store is opened on first use. Appends hold an exclusive ``flock`` and
+    first pick up the keys other processes appended, so several processes
+    can share one store.
+    """
+
+    def __init__(self, model_name, dim, cache_dir=None, max_memory_items=20000, initial_capacity=4096):
+        self.model_name = model_name
+        self.dim = dim
+        self.max_memory_items = max_memory_items
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._index = {}
+        self._matrix = None
+        self._capacity = 0
+        self._rows = 0
+        self._keys_offset = 0
+        self._initial_capacity = initial_capacity
+        self._store_dir = None
+
+        if cache_dir:
+            slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+            self._store_dir = os.path.join(cache_dir, slug)
+
+    # ------------------ 💾 Disk store ------------------
+    @property
+    def _vectors_path(self):
+        return os.path.join(self._store_dir, "vectors.f32")
+
+    @property
+    def _keys_path(self):
+        return os.path.join(self._store_dir, "keys.txt")
+
+    @property
+    def _lock_path(self):
+        return os.path.join(self._store_dir, "lock")
+
+    @property
+    def _row_bytes(self):
+        return self.dim * np.dtype(np.float32).itemsize
+
+    def _ensure_store(self):
+        if self._store_dir is None or self._matrix is not None:
+            return
+        os.makedirs(self._store_dir, exist_ok=True)
+        with self._file_lock():
+            self._read_new_keys()
+            self._resize(max(self._initial_capacity, self._rows))
+
+    def _file_lock(self):
+        lock_file = open(self._lock_path, "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # Closing the file releases the lock
+        return lock_file
+
+    def _read_new_keys(self):
+        """Index the keys appended to keys.txt since the last read, by this or another process."""
+        if not os.path.exists(self._keys_path):
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        # Only whole lines: a key is complete once its newline is written
+        data = data[:data.rfind(b"\n") + 1]
+        self._keys_offset += len(data)
+        for line in data.decode("utf-8").splitlines():
+            self._index.setdefault(line.strip(), self._rows)
+            self._rows += 1
+
+    def _resize(self, capacity):
+        if self._matrix is not None:
+            self._matrix.flush()
+            del self._matrix
+        with open(self._vectors_path, "ab") as f:
+            # Never shrink: another process may already have grown the file
+            capacity = max(capacity, os.fstat(f.fileno()).st_size // self._row_bytes)
+            f.truncate(capacity * self._row_bytes)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _append_to_disk(self, items):
+        with self._file_lock():
+            # Rows are assigned by position in keys.txt, so catch up with other writers first
+            self._read_new_keys()
+            if self._rows > self._capacity:
+                self._resize(self._rows)
+            items = [(key, vector) for key, vector in dict(items).items() if key not in self._index]
+            if not items:
+                return
+            needed = self._rows + len(items)
+            if needed > self._capacity:
+                self._resize(max(needed, self._capacity * 2))
+
+            for key, vector in items:
+                self._matrix[self._rows] = vector
+                self._index[key] = self._rows
+                self._rows += 1
+            # Vectors before keys: a crash in between leaves unused rows, never keys without vectors
+            self._matrix.flush()
+            lines = "".join(f"{key}\n" for key, _ in items).encode("utf-8")
+            with open(self._keys_path, "ab") as f:
+                f.write(lines)
+            self._keys_offset += len(lines)
+
+    # ------------------ 🧠 In-memory LRU ------------------
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    # ------------------ 🔑 Public API ------------------
+    def key(self, text):
+        return cache_key(text, self.model_name)
+
+    def get(self, key):
+        with self._lock:
+            return self._lookup(key)
+
+    def _lookup(self, key):
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            self.memory_hits += 1
+            return vector
+
+        self._ensure_store()
+        row = self._index.get(key)
+        if row is not None:
+            vector = np.array(self._matrix[row], dtype=np.float32)
+            self._remember(key, vector)
+            self.hits += 1
+            self.disk_hits += 1
+            return vector
+
+        self.misses += 1
+        return None
+
+    def put_many(self, items):
+        items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items]
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self._store_dir is not None:
+                self._ensure_store()
+                self._append_to_disk(items)
+
+    def put(self, key, vector):
+        self.put_many([(key, vector)])
+
+    def get_or_compute(self, texts, compute):
+        """Return one row per text, calling ``compute`` only on cache misses.
+
+        ``compute`` receives the list of distinct missing texts and must
+        return a 2-D array with one row per text.
+        """
+        keys = [self.key(t) for t in texts]
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+
+        missing = OrderedDict()
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._lookup(key)
+                if vector is None:
+                    missing.setdefault(key, (texts[i], []))[1].append(i)
+                else:
+                    out[i] = vector
+
+        if missing:
+            computed = compute([text for text, _ in missing.values()])
+            for (key, (_, rows)), vector in zip(missing.items(), computed):
+                out[rows] = vector
+            self.put_many(zip(missing.keys(), computed))
+
+        return out
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": len(self._index),
+            }
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
@@ -1,74 +1,268 @@
 from PIL import Image
 import numpy as np
 import re
-import easyocr
-from transformers import BlipProcessor, BlipForConditionalGeneration, MarianMTModel, MarianTokenizer
 import io
+import os
+import threading
+from collections import OrderedDict
 
-def arabic_text_from_image(image_input):
-    # ------------------ 🔤 Helper: Check Arabic Only ------------------
-    def is_arabic_only(text):
-        return all(
-            re.fullmatch(r'[\u0600-\u06FF]', ch) or ch.isspace()
-            for ch in text
-        )
-
-    # ------------------ 🖼️ Helper: Describe image in Arabic ------------------
-    def describe_image_arabic(pil_image):
-        processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-        model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-        inputs = processor(images=pil_image, return_tensors="pt")
-        out = model.generate(**inputs)
-        english_description = processor.decode(out[0], skip_special_tokens=True)
-
-        tokenizer = MarianTokenizer.from_pretrained("Helsinki-NLP/opus-mt-en-ar")
-        translator = MarianMTModel.from_pretrained("Helsinki-NLP/opus-mt-en-ar")
-        translated = tokenizer(english_description, return_tensors="pt", padding=True)
-        output = translator.generate(**translated)
-        arabic_description = tokenizer.decode(output[0], skip_special_tokens=True)
-        return arabic_description
-
-    # ------------------ 📥 Load image ------------------
-    if isinstance(image_input, (str, bytes)):  
-        img = Image.open(image_input).convert("RGB")
-    else:  
-        img = Image.open(io.BytesIO(image_input.read())).convert("RGB")
-
-    # ------------------ 🔍 OCR ------------------
+import metrics
+import model_registry
+import result_cache
+
+BLIP_MODEL = "Salesforce/blip-image-captioning-base"
+MARIAN_MODEL = "Helsinki-NLP/opus-mt-en-ar"
+# Images are downscaled so their longer side is at most OCR_MAX_SIDE pixels before detection; 0 keeps full size
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "1600"))
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))
+# Captioning fallback: greedy decoding capped at CAPTION_MAX_TOKENS new tokens,
+# CAPTION_BATCH_SIZE images per generate() call, optional int8 dynamic quantization on CPU
+CAPTION_MAX_TOKENS = int(os.getenv("CAPTION_MAX_TOKENS", "30"))
+TRANSLATION_MAX_TOKENS = int(os.getenv("TRANSLATION_MAX_TOKENS", "64"))
+CAPTION_BATCH_SIZE = int(os.getenv("CAPTION_BATCH_SIZE", "8"))
+CAPTION_INT8 = os.getenv("CAPTION_INT8", "0") == "1"
+# Identifies image texts in the media result cache; bump when OCR or captioning changes
+IMAGE_MODEL_ID = (
+    f"easyocr[ar,en]@{OCR_MAX_SIDE}|{BLIP_MODEL}|{MARIAN_MODEL}"
+    f"|greedy={CAPTION_MAX_TOKENS},{TRANSLATION_MAX_TOKENS}{'|int8' if CAPTION_INT8 else ''}"
+)
+
+ARABIC_ONLY_RE = re.compile(r"[\u0600-\u06FF\s]*")
+
+
+@model_registry.register("easyocr")
+def _load_ocr_reader():
+    import easyocr
     reader = easyocr.Reader(['ar', 'en'], gpu=False)
-    results = reader.readtext(np.array(img))  
+    return reader
+
+
+@model_registry.register("blip")
+def _load_blip():
+    from transformers import BlipProcessor, BlipForConditionalGeneration
+    processor = BlipProcessor.from_pretrained(BLIP_MODEL)
+    model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL)
+    model.eval()
+    return processor, _quantize(model) if CAPTION_INT8 else model
+
+
+@model_registry.register("marian")
+def _load_marian():
+    from transformers import MarianMTModel, MarianTokenizer
+    tokenizer = MarianTokenizer.from_pretrained(MARIAN_MODEL)
+    translator = MarianMTModel.from_pretrained(MARIAN_MODEL)
+    translator.eval()
+    return tokenizer, _quantize(translator) if CAPTION_INT8 else translator
+
+
+def _quantize(model):
+    # int8 weights for every Linear layer, activations quantized on the fly (CPU only)
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
 
-    # ------------------ 🧹 Filter Arabic only ------------------
-    filtered_results = [res for res in results if is_arabic_only(res[1])]
+@model_registry.register("caption_engine")
+def _load_caption_engine():
+    return CaptionEngine()
 
-    # ------------------ 📏 Group lines ------------------
+
+# ------------------ 🔤 Helper: Check Arabic Only ------------------
+def is_arabic_only(text):
+    return ARABIC_ONLY_RE.fullmatch(text) is not None
+
+
+# ------------------ 📥 Helper: Load and downscale ------------------
+def load_image(image_input, max_side=OCR_MAX_SIDE):
+    if isinstance(image_input, str):
+        img = Image.open(image_input)
+    elif isinstance(image_input, bytes):
+        img = Image.open(io.BytesIO(image_input))
+    else:
+        img = Image.open(io.BytesIO(image_input.read()))
+    img = img.convert("RGB")
+
+    if max_side and max(img.size) > max_side:
+        scale = max_side / max(img.size)
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+    return img
+
+
+# ------------------ 📏 Helper: Group lines ------------------
+def group_lines(results):
+    """Join Arabic OCR boxes into lines, right to left within a line and top to bottom overall.
+
+    A box joins the first line whose mean y-center is within 0.8 of the box
+    height. Line sums and counts are kept in arrays so every box is checked
+    against all lines at once.
+    """
+    sums = np.zeros(len(results))
+    counts = np.zeros(len(results))
     lines = []
-    for res in filtered_results:
+    for res in results:
         (tl, tr, br, bl), text = res[0], res[1]
+        if not is_arabic_only(text):
+            continue
         y_center = (tl[1] + bl[1]) / 2
         height = abs(bl[1] - tl[1])
-        x_start = tl[0]
-
-        matched = False
-        for line in lines:
-            avg_y = sum([w['y_center'] for w in line]) / len(line)
-            if abs(y_center - avg_y) < height * 0.8:
-                line.append({'x': x_start, 'text': text, 'y_center': y_center})
-                matched = True
-                break
-        if not matched:
-            lines.append([{'x': x_start, 'text': text, 'y_center': y_center}])
-
-    ordered_lines = sorted(
-        [sorted(line, key=lambda w: w['x'], reverse=True) for line in lines],
-        key=lambda line: sum([w['y_center'] for w in line]) / len(line)
+
+        n = len(lines)
+        matches = np.flatnonzero(np.abs(y_center - sums[:n] / counts[:n]) < height * 0.8)
+        index = int(matches[0]) if len(matches) else n
+        if index == n:
+            lines.append([])
+        lines[index].append((tl[0], text))
+        sums[index] += y_center
+        counts[index] += 1
+
+    order = sorted(range(len(lines)), key=lambda i: sums[i] / counts[i])
+    return [
+        " ".join(text for _, text in sorted(lines[i], key=lambda w: w[0], reverse=True))
+        for i in order
+    ]
+
+
+# ------------------ 🖼️ Helper: Describe image in Arabic ------------------
+class CaptionEngine:
+    """BLIP captions translated to Arabic by Marian, a batch of images at a time.
+
+    Both models decode greedily with bounded output length. Translations are
+    kept in an LRU keyed by the English caption, since similar pictures
+    (product shots, screenshots) often get the same caption.
+    """
+
+    def __init__(self, max_new_tokens=CAPTION_MAX_TOKENS, translation_max_tokens=TRANSLATION_MAX_TOKENS,
+                 batch_size=CAPTION_BATCH_SIZE, translation_cache_size=2048):
+        self.max_new_tokens = max_new_tokens
+        self.translation_max_tokens = translation_max_tokens
+        self.batch_size = batch_size
+        self.translation_cache_size = translation_cache_size
+        self.translation_hits = 0
+        self.translation_misses = 0
+        self._translations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def caption(self, images):
+        """English captions for a list of PIL images."""
+        import torch
+        processor, model = model_registry.get("blip")
+        captions = []
+        for start in range(0, len(images), self.batch_size):
+            inputs = processor(images=images[start:start + self.batch_size], return_tensors="pt")
+            with torch.inference_mode():
+                out = model.generate(**inputs, max_new_tokens=self.max_new_tokens, num_beams=1, do_sample=False)
+            captions.extend(processor.batch_decode(out, skip_special_tokens=True))
+        return captions
+
+    def translate(self, texts):
+        """Arabic translations of English ``texts``; each distinct caption is translated once."""
+        import torch
+        with self._lock:
+            translated = {t: self._translations[t] for t in dict.fromkeys(texts) if t in self._translations}
+            for text in translated:
+                self._translations.move_to_end(text)
+            missing = [t for t in dict.fromkeys(texts) if t not in translated]
+            self.translation_hits += len(texts) - len(missing)
+            self.translation_misses += len(missing)
+
+        if missing:
+            tokenizer, translator = model_registry.get("marian")
+            for start in range(0, len(missing), self.batch_size):
+                batch = missing[start:start + self.batch_size]
+                inputs = tokenizer(batch, return_tensors="pt", padding=True)
+                with torch.inference_mode():
+                    output = translator.generate(**inputs, max_new_tokens=self.translation_max_tokens, num_beams=1, do_sample=False)
+                translated.update(zip(batch, tokenizer.batch_decode(output, skip_special_tokens=True)))
+
+            with self._lock:
+                for text in missing:
+                    self._translations[text] = translated[text]
+                while len(self._translations) > self.translation_cache_size:
+                    self._translations.popitem(last=False)
+        return [translated[text] for text in texts]
+
+    def describe(self, images):
+        """Arabic descriptions for a list of PIL images."""
+        if not images:
+            return []
+        with metrics.track("caption", len(images)):
+            return self.translate(self.caption(images))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "translation_hits": self.translation_hits,
+                "translation_misses": self.translation_misses,
+                "cached_translations": len(self._translations),
+            }
+
+
+def describe_image_arabic(pil_image):
+    return model_registry.get("caption_engine").describe([pil_image])[0]
+
+
+def _ocr_text(results):
+    """OCR lines with at least two words, or None when the image needs a caption instead."""
+    cleaned_lines = [line for line in group_lines(results) if len(line.split()) >= 2]
+    return "\n".join(cleaned_lines) if cleaned_lines else None
+
+
+def _text_from_results(results, img):
+    text = _ocr_text(results)
+    return text if text is not None else describe_image_arabic(img)
+
+
+def arabic_text_from_image(image_input):
+    # Repeat uploads of the same bytes are served from the media result cache
+    return result_cache.cached_extraction(
+        image_input, "image", IMAGE_MODEL_ID,
+        lambda: _arabic_text_from_image(image_input),
     )
 
-    final_text_lines = [" ".join([w['text'] for w in line]) for line in ordered_lines]
-    cleaned_lines = [line for line in final_text_lines if len(line.split()) >= 2]
 
-    if cleaned_lines:
-        return "\n".join(cleaned_lines)
+def _arabic_text_from_image(image_input):
+    with metrics.track("decode"):
+        img = load_image(image_input)
+    reader = model_registry.get("easyocr")
+    with metrics.track("ocr"):
+        results = reader.readtext(np.array(img), batch_size=OCR_BATCH_SIZE)
+    return _text_from_results(results, img)
+
+
+def arabic_texts_from_images(image_inputs, batch_size=OCR_BATCH_SIZE):
+    """``arabic_text_from_image`` for several images, running same-sized images through the reader together."""
+    store = result_cache.default_store()
+    if store is not None:
+        hashes = [result_cache.hash_media(media) for media in image_inputs]
+        texts = [store.get(h, IMAGE_MODEL_ID) for h in hashes]
     else:
-        arabic_description = describe_image_arabic(img)
-        return arabic_description
+        hashes, texts = None, [None] * len(image_inputs)
+
+    by_size = {}
+    with metrics.track("decode", 0) as call:
+        for i, media in enumerate(image_inputs):
+            if texts[i] is None:
+                img = load_image(media)
+                by_size.setdefault(img.size, []).append((i, img))
+                call["items"] += 1
+
+    reader = model_registry.get("easyocr") if by_size else None
+    fallback = []
+    for group in by_size.values():
+        with metrics.track("ocr", len(group)):
+            batch_results = reader.readtext_batched([np.array(img) for _, img in group], batch_size=batch_size)
+        for (i, img), results in zip(group, batch_results):
+            texts[i] = _ocr_text(results)
+            if texts[i] is None:
+                fallback.append((i, img))
+
+    # Every image without usable OCR text goes through BLIP and Marian together
+    if fallback:
+        descriptions = model_registry.get("caption_engine").describe([img for _, img in fallback])
+        for (i, _), description in zip(fallback, descriptions):
+            texts[i] = description
+
+    if store is not None:
+        for group in by_size.values():
+            for i, _ in group:
+                store.put(hashes[i], IMAGE_MODEL_ID, "image", texts[i])
+    return texts
@@ -0,0 +1,295 @@
+import codecs
+import json
+import random
+from contextlib import nullcontext
+
+import numpy as np
+
+from preprocessing import preprocess_batch
+
+READ_SIZE = 1 << 16
+DEFAULT_CHUNK_SIZE = 512
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+REVIEW_FILE_EXTENSIONS = (".json",) + JSON_LINES_EXTENSIONS
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_NUMBER_TERMINATORS = ",]}" + _WHITESPACE
+
+
+# ============================================
+# 1. Incremental text reader
+# ============================================
+class _TextBuffer:
+    """Decoded text read from a binary or text file object in fixed-size blocks."""
+
+    def __init__(self, fileobj, read_size=READ_SIZE):
+        self.fileobj = fileobj
+        self.read_size = read_size
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        raw = self.fileobj.read(self.read_size)
+        # EOF is decided on the raw read: a block ending mid-character decodes to ""
+        if not raw:
+            self.eof = True
+        block = self.decoder.decode(raw, final=self.eof) if isinstance(raw, bytes) else raw
+        if self.eof and not block:
+            return False
+        # Drop what has already been consumed so the buffer stays small
+        self.text = self.text[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip_whitespace()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON input")
+        self.pos += 1
+
+    def value(self):
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number cut by the buffer edge ("1." of "1.5") decodes short; keep
+            # reading until a terminator follows it or the input ends
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and (end == len(self.text) or self.text[end] not in _NUMBER_TERMINATORS)
+                    and self.fill()):
+                continue
+            self.pos = end
+            return value
+
+
+# ============================================
+# 2. Streaming readers
+# ============================================
+def iter_json_reviews(fileobj, field="comment"):
+    """Yield comments from a ``{"reviews": [{"comment": ...}, ...]}`` document one at a time."""
+    buf = _TextBuffer(fileobj)
+    buf.expect("{")
+    found = False
+
+    while buf.peek() != "}":
+        key = buf.value()
+        buf.expect(":")
+        if key == "reviews" and buf.peek() == "[":
+            found = True
+            buf.expect("[")
+            while buf.peek() != "]":
+                review = buf.value()
+                if isinstance(review, dict):
+                    comment = str(review.get(field, "") or "").strip()
+                    if comment:
+                        yield comment
+                if buf.peek() == ",":
+                    buf.pos += 1
+            buf.expect("]")
+        else:
+            buf.value()
+
+        if buf.peek() == ",":
+            buf.pos += 1
+
+    if not found:
+        raise ValueError("JSON document has no 'reviews' list")
+
+
+def iter_json_lines(fileobj, field="comment"):
+    """Yield comments from JSON Lines input, one object (or string) per line."""
+    if hasattr(fileobj, "encoding"):
+        lines = fileobj
+    else:
+        lines = codecs.getreader("utf-8-sig")(fileobj)
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if isinstance(record, dict):
+            record = record.get(field, "")
+        comment = str(record or "").strip()
+        if comment:
+            yield comment
+
+
+def iter_comments(fileobj, filename, field="comment"):
+    if filename.lower().endswith(JSON_LINES_EXTENSIONS):
+        return iter_json_lines(fileobj, field)
+    return iter_json_reviews(fileobj, field)
+
+
+# ============================================
+# 3. Chunked preprocess → embed → predict
+# ============================================
+class StreamingSentiment:
+    """Classify comments in fixed-size chunks and keep only running results.
+
+    Embeddings are dropped after each chunk. Per-file counts are exact; the
+    review texts kept for summarization are a reservoir sample of at most
+    ``max_reviews_per_label`` per sentiment. Comments that preprocessing
+    rejects as non-Arabic are not classified; they are only counted in
+    ``unclassified`` and ``file_unclassified``.
+    """
+
+    def __init__(self, embed_batch, predict, chunk_size=DEFAULT_CHUNK_SIZE, max_reviews_per_label=2000, seed=0,
+                 stages=None, on_prediction=None, dedup=None, per_file_reviews=False):
+        self.embed_batch = embed_batch
+        self.predict = predict
+        self.dedup = dedup
+        self.stages = stages
+        self.on_prediction = on_prediction
+        self.chunk_size = chunk_size
+        self.max_reviews_per_label = max_reviews_per_label
+        self.counts = {"positive": 0, "negative": 0}
+        self.file_counts = {}
+        self.unclassified = 0
+        self.file_unclassified = {}
+        self.reviews = {"positive": [], "negative": []}
+        # File of each kept review, so a failed file can be taken back out
+        self._review_files = {"positive": [], "negative": []}
+        # Optional per-file reservoirs, so results can be stored and merged file by file
+        self.file_reviews = {} if per_file_reviews else None
+        # Reviews offered to each reservoir; duplicates are never offered, so
+        # they must not count toward the sampling odds either
+        self._offered = {"positive": 0, "negative": 0}
+        self._file_offered = {}
+        self._rng = random.Random(seed)
+        self._pending = []
+
+    def add(self, text, filename):
+        self._pending.append((text, filename))
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def add_stream(self, texts, filename):
+        for text in texts:
+            self.add(text, filename)
+
+    def flush(self):
+        if not self._pending:
+            return
+        texts = [text for text, _ in self._pending]
+        with self._track("preprocess", len(texts)):
+            processed_texts = preprocess_batch(texts)
+        # Non-Arabic comments preprocess to None; an empty-string placeholder
+        # vector would give them all the same label
+        rows = [i for i, processed in enumerate(processed_texts) if processed is not None]
+        labels = [None] * len(texts)
+        representative = [False] * len(texts)
+        if rows:
+            classified = [processed_texts[i] for i in rows]
+            with self._track("embed", len(rows)):
+                X_input = self.embed_batch(classified)
+            if self.dedup is None:
+                with self._track("predict", len(rows)):
+                    raw_predictions = np.asarray(self.predict(X_input))
+                keep = [True] * len(rows)
+            else:
+                raw_predictions, keep = self._predict_representatives([texts[i] for i in rows], classified, X_input)
+            for i, p, k in zip(rows, raw_predictions, keep):
+                labels[i] = "positive" if p == 1 else "negative"
+                representative[i] = k
+
+        for (text, filename), label, keep in zip(self._pending, labels, representative):
+            if label is None:
+                self.unclassified += 1
+                self.file_unclassified[filename] = self.file_unclassified.get(filename, 0) + 1
+                if self.on_prediction is not None:
+                    self.on_prediction(filename, text, None)
+                continue
+            self.counts[label] += 1
+            per_file = self.file_counts.setdefault(filename, {"positive": 0, "negative": 0})
+            per_file[label] += 1
+            # Duplicates still count toward the totals but are not sent to the summaries again
+            if keep:
+                self._offered[label] += 1
+                offered = self._file_offered.setdefault(filename, {"positive": 0, "negative": 0})
+                offered[label] += 1
+                self._keep(self.reviews[label], self._offered[label], text, self._review_files[label], filename)
+                if self.file_reviews is not None:
+                    kept = self.file_reviews.setdefault(filename, {"positive": [], "negative": []})
+                    self._keep(kept[label], offered[label], text)
+            if self.on_prediction is not None:
+                self.on_prediction(filename, text, label)
+        self._pending = []
+
+    def _track(self, stage, items):
+        if self.stages is None:
+            return nullcontext()
+        return self.stages.track(stage, items)
+
+    def _predict_representatives(self, texts, processed_texts, X_input):
+        # Only the first member of each new duplicate cluster is classified;
+        # every other member takes its representative's label
+        with self._track("dedup", len(processed_texts)):
+            slots, new_slots = self.dedup.assign(processed_texts, X_input, raw_texts=texts)
+            first_row = {}
+            for row, slot in enumerate(slots):
+                first_row.setdefault(int(slot), row)
+
+        if new_slots:
+            rows = [first_row[slot] for slot in new_slots]
+            with self._track("predict", len(rows)):
+                labels = np.asarray(self.predict(X_input[rows]))
+            for slot, label in zip(new_slots, labels):
+                self.dedup.labels[slot] = label
+
+        new = set(new_slots)
+        raw_predictions = [self.dedup.labels[slot] for slot in slots]
+        representative = [int(slot) in new and first_row[int(slot)] == row for row, slot in enumerate(slots)]
+        return raw_predictions, representative
+
+    def discard(self, filename):
+        """Take back everything ``filename`` contributed, e.g. after it failed partway through."""
+        self.flush()
+        counts = self.file_counts.pop(filename, {})
+        offered = self._file_offered.pop(filename, {})
+        for label in ("positive", "negative"):
+            self.counts[label] -= counts.get(label, 0)
+            self._offered[label] -= offered.get(label, 0)
+            kept = [(text, source) for text, source in zip(self.reviews[label], self._review_files[label])
+                    if source != filename]
+            self.reviews[label] = [text for text, _ in kept]
+            self._review_files[label] = [source for _, source in kept]
+        self.unclassified -= self.file_unclassified.pop(filename, 0)
+        if self.file_reviews is not None:
+            self.file_reviews.pop(filename, None)
+
+    def _keep(self, kept, seen, text, sources=None, source=None):
+        if self.max_reviews_per_label is None or len(kept) < self.max_reviews_per_label:
+            kept.append(text)
+            if sources is not None:
+                sources.append(source)
+            return
+        # Reservoir sampling: every review seen so far is kept with equal probability
+        slot = self._rng.randrange(seen)
+        if slot < self.max_reviews_per_label:
+            kept[slot] = text
+            if sources is not None:
+                sources[slot] = source
+
+    @property
+    def total(self):
+        return self.counts["positive"] + self.counts["negative"]
@@ -1,166 +1,267 @@
 import streamlit as st
 import plotly.graph_objects as go
-import numpy as np
-import json
+import os
+import random
 
-from model_ml import load_model, predict 
-from preprocessing import preprocess
-from embedding import embed 
-from Text_Generation import generate_negative_points
-from Text_Generation import generate_positive_points
-from image_model import arabic_text_from_image
-from vid_model import get_transcript
+import metrics
+import model_registry
+import result_cache
+
+from model_ml import get_engine, predict
+from embedding import EMBEDDING_DIM, embed_batch, cache_stats, encode_stats
+from dedup import make_index
+from ingest import StreamingSentiment
+from pipeline import extract_image_batch, extract_texts, group_files, modality
+from scheduler import FileScheduler, parse_workers
+
+# image_model, vid_model and Text_Generation pull in easyocr, transformers, NeMo
+# and the Gemini client, so they are imported only when a file needs them
+# (see pipeline.extract_texts).
 
 # Streamlit UI setup
 st.set_page_config(page_title="Dashboard", layout="wide")
 st.image("logo-black.png", width=200)  
 
+# Optional warm-up, e.g. WARMUP_MODELS="easyocr,nemo_asr" or WARMUP_MODELS="all".
+# Models are held by model_registry, so this only loads on the first run of the process.
+warmup = os.getenv("WARMUP_MODELS")
+if warmup:
+    model_registry.warm_up(None if warmup == "all" else [n.strip() for n in warmup.split(",") if n.strip()])
 
-def preprocess_text(text):
-    return preprocess(text)
 
+# Load xgboost model (held by model_registry, so only the first run pays for it)
+model = get_engine()
 
-# Load xgboost model 
-@st.cache_resource
-def get_model():
-    return load_model()
+# METRICS_PORT=9108 serves per-stage timings as Prometheus text on /metrics
+if os.getenv("METRICS_PORT"):
+    metrics.serve_prometheus(int(os.getenv("METRICS_PORT")))
+show_timings = st.sidebar.checkbox("Debug timings")
+profile_run = st.sidebar.checkbox("Profile this run", disabled=not show_timings)
 
-model = get_model()
+STATUS_ICONS = {"queued": "⏳", "inline": "⏳", "running": "🔄", "done": "✅", "failed": "❌"}
 
 #uploading multiple files
 uploaded_files = st.file_uploader(
-    "Upload .txt, .json, image, or video files for analysis",
-    type=["txt", "json", "jpg", "jpeg", "png", "mp4", "mov"],
+    "Upload .txt, .json, .jsonl, image, or video files for analysis",
+    type=["txt", "json", "jsonl", "jpg", "jpeg", "png", "mp4", "mov"],
     accept_multiple_files=True
 )
 
 if uploaded_files:
-    texts = []
-    filenames = []
-    vectors = []
-
-    for file in uploaded_files:
-        content = ""
-
-        if file.type == "application/json":
-            data = json.load(file)  
-            if isinstance(data, dict) and "reviews" in data:
-                for review in data["reviews"]:
-                    comment = review.get("comment", "").strip()
-                    if comment:
-                        processed = preprocess_text(comment)
-                        embedding = embed(processed)
-                        texts.append(comment)
-                        filenames.append(file.name)
-                        vectors.append(embedding)
+    # Comments are classified in fixed-size chunks as they are read, so only
+    # running counts and a bounded sample of review texts are kept in memory
+    # Exact and near-duplicate comments are collapsed after embedding (DEDUP_THRESHOLD)
+    timings_before = metrics.report()
+    # The profile is saved even when the run stops early (st.stop) or fails
+    with metrics.profile("dashboard", enabled=show_timings and profile_run) as run_profile:
+        # Widget interactions rerun this script. Per-file results (counts, review
+        # sample, error) are kept in session state by upload content hash, so a
+        # rerun only analyzes files that were not seen before. The dedup index is
+        # built per run: a stored one would keep its vectors alive for the whole
+        # session and drop new files' comments that repeat an earlier file's
+        file_results = st.session_state.setdefault("file_results", {})
+        sentiment = StreamingSentiment(embed_batch, predict, stages=metrics.REGISTRY,
+                                       dedup=make_index(EMBEDDING_DIM), per_file_reviews=True)
+
+        uploads = []
+        for file in uploaded_files:
+            if modality(file.name) is None:
+                st.warning(f"Unsupported file type: {file.name}")
             else:
-                st.warning(f"Invalid JSON format in: {file.name}")
+                uploads.append((result_cache.hash_media(file), file))
+        keys = list(dict.fromkeys(key for key, _ in uploads))
+        files = list({key: file for key, file in uploads if key not in file_results}.values())
+        file_keys = {id(file): key for key, file in uploads}
+
+        # Images, videos and text files are extracted concurrently on per-modality
+        # pools (SCHEDULER_WORKERS="video=1,image=2,text=4"); review exports stream here
+        # Images are batched into one job per IMAGE_JOB_SIZE files so OCR and captioning run together
+        groups = group_files([file.name for file in files])
+        job_of = {i: job for job, group in enumerate(groups) for i in group}
+        progress = st.progress(0.0, text="Processing files...")
+        file_status = st.empty()
+        scheduler_states = ["queued"] * len(groups)
+        overrides = {}  # per file: inline review exports and failures are tracked here
+        errors = {}
+
+        def show_progress(new_states=None):
+            if new_states is not None:
+                scheduler_states[:] = new_states
+            states = [overrides.get(i, scheduler_states[job_of[i]]) for i in range(len(files))]
+            finished = sum(state in ("done", "failed") for state in states)
+            progress.progress(finished / max(1, len(states)), text=f"Processed {finished}/{len(states)} files")
+            file_status.markdown("\n".join(
+                f"- {STATUS_ICONS.get(state, '⏳')} {file.name}" for file, state in zip(files, states)
+            ))
+
+        # Video workers publish the transcript so far; the polling loop below renders it
+        transcript_box = st.empty()
+        partial_transcripts = {}
+
+        def show_partial_transcripts():
+            transcript_box.markdown("\n\n".join(
+                f"🎙️ **{name}** — …{text[-300:]}" for name, text in list(partial_transcripts.items())
+            ))
+
+        def extract_upload(file):
+            def on_partial(text):
+                partial_transcripts[file.name] = text
+            return list(extract_texts(file, file.name, on_partial))
+
+        def extract_group(group):
+            if modality(group[0].name) == "image":
+                return extract_image_batch(group)
+            return [extract_upload(file) for file in group]
+
+        jobs = [
+            (modality(files[group[0]].name), None if modality(files[group[0]].name) == "reviews" else extract_group,
+             ([files[i] for i in group],))
+            for group in groups
+        ]
+        with FileScheduler(parse_workers(os.getenv("SCHEDULER_WORKERS"))) as scheduler:
+            for job, future in scheduler.run(jobs, on_update=show_progress, on_poll=show_partial_transcripts):
+                results = [None] * len(groups[job])
+                if future is not None:
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        results = [e] * len(groups[job])
+                for index, texts in zip(groups[job], results):
+                    file = files[index]
+                    key = file_keys[id(file)]
+                    try:
+                        if future is None:
+                            overrides[index] = "running"
+                            show_progress()
+                            sentiment.add_stream(extract_texts(file, file.name), key)
+                            overrides[index] = "done"
+                        elif isinstance(texts, Exception):
+                            raise texts
+                        else:
+                            sentiment.add_stream(texts, key)
+                    except Exception as e:
+                        overrides[index] = "failed"
+                        if future is None and isinstance(e, ValueError):
+                            errors[key] = f"Invalid JSON format in: {file.name}"
+                        else:
+                            errors[key] = f"Could not process {file.name}: {e}"
+                show_progress()
+
+        progress.empty()
+        transcript_box.empty()
+
+        sentiment.flush()
+        failed = {}
+        for file in files:
+            key = file_keys[id(file)]
+            if key in errors:
+                # Failures are not memoized, so the next rerun tries the file again,
+                # and whatever a file read before failing stays out of the totals
+                failed[key] = {
+                    "name": file.name,
+                    "counts": {"positive": 0, "negative": 0},
+                    "unclassified": 0,
+                    "reviews": {"positive": [], "negative": []},
+                    "error": errors[key],
+                }
                 continue
-
-        elif file.type == "text/plain":
-            content = file.read().decode("utf-8")
-            processed = preprocess_text(content)
-            embedding = embed(processed)
-            texts.append(content)
-            filenames.append(file.name)
-            vectors.append(embedding)
-
-        elif file.type in ["image/jpeg", "image/png"]:
-            content = arabic_text_from_image(file)
-            processed = preprocess_text(content)
-            embedding = embed(processed)
-            texts.append(content)
-            filenames.append(file.name)
-            vectors.append(embedding)
-
-        elif file.type in ["video/mp4", "video/quicktime"]:
-            with st.spinner(f"Transcribing video: {file.name}"):
-                content = get_transcript(file)
-                processed = preprocess_text(content)
-                embedding = embed(processed)
-                texts.append(content)
-                filenames.append(file.name)
-                vectors.append(embedding)
-
+            file_results[key] = {
+                "name": file.name,
+                "counts": sentiment.file_counts.get(key, {"positive": 0, "negative": 0}),
+                "unclassified": sentiment.file_unclassified.get(key, 0),
+                "reviews": sentiment.file_reviews.get(key, {"positive": [], "negative": []}),
+                "error": None,
+            }
+
+        # Aggregates are rebuilt from the stored results of the current uploads
+        results = [file_results.get(key) or failed[key] for key in keys]
+        for result in results:
+            if result["error"]:
+                st.warning(result["error"])
+
+        positive_value = sum(r["counts"]["positive"] for r in results)
+        negative_value = sum(r["counts"]["negative"] for r in results)
+        total = positive_value + negative_value
+        unclassified = sum(r["unclassified"] for r in results)
+        if unclassified:
+            st.info(f"{unclassified} comments are not in Arabic and were left out of the sentiment analysis.")
+        if not total:
+            st.warning("No Arabic comments found in the uploaded files." if unclassified else "No comments found in the uploaded files.")
+            st.stop()
+
+        # Count sentiment
+        positive_percentage = int((positive_value / total) * 100)
+        negative_percentage = 100 - positive_percentage
+
+        #Separating positives and negatives (a seeded sample keeps reruns, and their summaries, stable)
+        def sample_reviews(label):
+            reviews = [review for r in results for review in r["reviews"][label]]
+            if len(reviews) <= sentiment.max_reviews_per_label:
+                return reviews
+            return random.Random(0).sample(reviews, sentiment.max_reviews_per_label)
+
+        positive_reviews = sample_reviews("positive")
+        negative_reviews = sample_reviews("negative")
+
+        # Determine styling
+        if positive_value >= negative_value:
+            larger_color = "#A8DEE6"
+            smaller_color = "#01516D"
+            center_text = "Positive"
+            center_color = "#0077B6"
+            percentage_display = f"{positive_percentage}%"
         else:
-            st.warning(f"Unsupported file type: {file.name}")
-            continue
-
-    X_input = np.array(vectors)
-
-    # Predict
-    raw_predictions = predict(X_input)
-
-    predictions = ["positive" if p == 1 else "negative" for p in raw_predictions]
-
-    # Count sentiment
-    positive_value = sum(1 for p in predictions if p == "positive")
-    negative_value = sum(1 for p in predictions if p == "negative")
-    total = positive_value + negative_value
-    positive_percentage = int((positive_value / total) * 100)
-    negative_percentage = 100 - positive_percentage
-
-    #Separating positives and negatives 
-    positive_reviews = []
-    negative_reviews = []
-
-    for text, label in zip(texts, predictions):
-        if label == "positive":
-            positive_reviews.append(text)
-        else:
-            negative_reviews.append(text)
-
-    # Determine styling
-    if positive_value >= negative_value:
-        larger_color = "#A8DEE6"
-        smaller_color = "#01516D"
-        center_text = "Positive"
-        center_color = "#0077B6"
-        percentage_display = f"{positive_percentage}%"
-    else:
-        larger_color = "#FF9B8C"
-        smaller_color = "#C72C4E"
-        center_text = "Negative"
-        center_color = "#D62828"
-        percentage_display = f"{negative_percentage}%"
-
-    values = [positive_value, negative_value]
-    colors = [larger_color, smaller_color] if positive_value >= negative_value else [smaller_color, larger_color]
-    labels = ["Positive", "Negative"]
-
-    # Donut chart
-    fig = go.Figure(data=[go.Pie(
-        labels=labels,
-        values=values,
-        hole=0.65,
-        marker=dict(colors=colors),
-        textinfo='none',
-    )])
-
-    fig.update_layout(
-        annotations=[
-            dict(
-                x=0.5, y=0.56,
-                text=f"<b style='color:{center_color};font-size:20px'>{center_text}</b>",
-                showarrow=False,
-                font_size=20,
-                align='center'
-            ),
-            dict(
-                x=0.5, y=0.44,
-                text=f"<b style='font-size:16px;color:#555'>{percentage_display}</b>",
-                showarrow=False,
-                font_size=16
-            )
-        ],
-        showlegend=False,
-        margin=dict(t=20, b=20, l=20, r=20)
-    )
-
-    # Placeholder summaries
-    positive_text = generate_positive_points(positive_reviews)
-
-    negative_text = generate_negative_points(negative_reviews)
+            larger_color = "#FF9B8C"
+            smaller_color = "#C72C4E"
+            center_text = "Negative"
+            center_color = "#D62828"
+            percentage_display = f"{negative_percentage}%"
+
+        values = [positive_value, negative_value]
+        colors = [larger_color, smaller_color] if positive_value >= negative_value else [smaller_color, larger_color]
+        labels = ["Positive", "Negative"]
+
+        # Donut chart
+        fig = go.Figure(data=[go.Pie(
+            labels=labels,
+            values=values,
+            hole=0.65,
+            marker=dict(colors=colors),
+            textinfo='none',
+        )])
+
+        fig.update_layout(
+            annotations=[
+                dict(
+                    x=0.5, y=0.56,
+                    text=f"<b style='color:{center_color};font-size:20px'>{center_text}</b>",
+                    showarrow=False,
+                    font_size=20,
+                    align='center'
+                ),
+                dict(
+                    x=0.5, y=0.44,
+                    text=f"<b style='font-size:16px;color:#555'>{percentage_display}</b>",
+                    showarrow=False,
+                    font_size=16
+                )
+            ],
+            showlegend=False,
+            margin=dict(t=20, b=20, l=20, r=20)
+        )
+
+        # Summaries: both sentiments run concurrently; large review sets are reduced to
+        # representative reviews and summarized map-reduce style (see summarization.py)
+        from summarization import summarize_points
+
+        # Summaries of the same set of files are reused across reruns
+        summary_key = tuple(sorted(keys))
+        if st.session_state.get("summary_key") != summary_key:
+            st.session_state.summary = summarize_points(positive_reviews, negative_reviews)
+            st.session_state.summary_key = summary_key
+        positive_text, negative_text, summary_report = st.session_state.summary
+    run_timings = metrics.since(timings_before)
+    metrics.log_report(run_timings, source="dashboard")
 
     # Layout
     col1, col2 = st.columns([1, 1.2])
@@ -185,8 +286,72 @@ if uploaded_files:
 
     # File predictions
     with st.expander("📄 Show Predictions for Each File"):
-        for name, pred in zip(filenames, predictions):
-            st.markdown(f"**{name}** — `{pred}`")
+        for result in results:
+            if result["error"]:
+                continue
+            name, counts = result["name"], result["counts"]
+            if counts["positive"] + counts["negative"] == 1:
+                pred = "positive" if counts["positive"] else "negative"
+                st.markdown(f"**{name}** — `{pred}`")
+            else:
+                st.markdown(f"**{name}** — `{counts['positive']} positive` / `{counts['negative']} negative`")
+
+    with st.expander("🧾 Summary Requests"):
+        for entry in summary_report:
+            if entry["stage"] == "select":
+                st.markdown(f"**{entry['sentiment']} / select** — {entry['reviews']} reviews → "
+                            f"{entry['representatives']} representatives in `{entry['seconds']:.2f}s`")
+            else:
+                st.markdown(f"**{entry['sentiment']} / {entry['stage']}** — {entry['requests']} requests, "
+                            f"~{entry['prompt_tokens']} prompt tokens, `{entry['seconds']:.2f}s`")
+
+    with st.expander("⚙️ Loaded Models"):
+        for name, info in model_registry.stats().items():
+            memory = f"{info['rss_delta_mb']:.0f} MB" if info["rss_delta_mb"] is not None else "n/a"
+            st.markdown(f"**{name}** — loaded in `{info['load_seconds']:.1f}s`, resident memory `{memory}`")
+
+    if show_timings:
+        with st.expander("⏱️ Debug Timings", expanded=True):
+            st.dataframe([
+                {
+                    "stage": stage,
+                    "seconds": round(entry["seconds"], 3),
+                    "calls": entry["calls"],
+                    "items": entry["items"],
+                    "items/s": round(entry["items_per_s"], 1) if entry["items_per_s"] else None,
+                    "peak RSS (MB)": round(entry["peak_rss_bytes"] / 2**20) if entry["peak_rss_bytes"] else None,
+                }
+                for stage, entry in run_timings.items()
+            ], use_container_width=True)
+            if run_profile is not None:
+                st.caption(f"Profile saved to {run_profile.path}")
+                st.code(run_profile.summary)
+
+    stats = cache_stats()
+    st.caption(
+        f"Embedding cache: {stats['hits']} hits / {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%} hit rate, {stats['disk_items']} vectors on disk)"
+    )
+    encoder = encode_stats()
+    if encoder["documents"]:
+        st.caption(
+            f"Encoder: {encoder['documents']} texts in {encoder['windows']} windows, "
+            f"{encoder['padding_efficiency']:.0%} padding efficiency "
+            f"({encoder['unsorted_padding_efficiency']:.0%} unsorted), {encoder['tokens_per_s']:.0f} tokens/s"
+        )
+    if sentiment.dedup is not None:
+        dedup_stats = sentiment.dedup.stats()
+        st.caption(
+            f"Duplicates: {dedup_stats['exact_duplicates']} exact and {dedup_stats['near_duplicates']} near-duplicate "
+            f"comments collapsed into {dedup_stats['representatives']} representatives"
+        )
+    media_store = result_cache.default_store()
+    if media_store is not None:
+        media_stats = media_store.stats()
+        st.caption(
+            f"Transcript/OCR cache: {media_stats['hits']} hits / {media_stats['misses']} misses "
+            f"({media_stats['entries']} entries, {media_stats['bytes'] / 2**20:.1f} MB)"
+        )
 
 else:
     st.warning("Please upload at least one .txt file.")
@@ -0,0 +1,240 @@
+"""Per-stage timings, counts and memory for the whole process.
+
+Every module records into ``REGISTRY`` through ``track``; the dashboard, the
+batch CLI and an optional Prometheus endpoint (METRICS_PORT) read it back.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("onesight.metrics")
+
+# Seconds between RSS samples while a stage is running
+SAMPLE_INTERVAL = float(os.getenv("METRICS_SAMPLE_INTERVAL", "0.05"))
+PROFILE_DIR = os.getenv("METRICS_PROFILE_DIR", "./cache/profiles")
+
+
+def rss_bytes():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Metrics:
+    """Thread-safe wall time, call count, item count and peak RSS per stage.
+
+    While any stage is running a daemon thread samples the process RSS every
+    ``sample_interval`` seconds, so the recorded peak covers memory held only
+    in the middle of a call. Calls read the latest sample instead of /proc,
+    which keeps ``track`` cheap enough for per-item use. RSS is process-wide:
+    stages running concurrently share their peaks.
+    """
+
+    def __init__(self, sample_interval=SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._active = {}
+        self._sampler = None
+        self._last_rss = None
+
+    @contextmanager
+    def track(self, stage, items=1):
+        # The caller may correct the item count through the yielded dict
+        call = {"items": items}
+        token = object()
+        with self._lock:
+            self._start_sampler()
+            start_rss = self._last_rss
+            self._active[token] = start_rss
+        start = time.perf_counter()
+        try:
+            yield call
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                samples = [rss for rss in (self._active.pop(token), self._last_rss) if rss is not None]
+            peak = max(samples) if samples else None
+            delta = peak - start_rss if peak is not None and start_rss is not None else None
+            self.add(stage, elapsed, call["items"], peak, delta)
+
+    def add(self, stage, seconds, items=1, peak_rss=None, peak_delta=None):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"seconds": 0.0, "calls": 0, "items": 0,
+                                                    "peak_rss_bytes": None, "peak_delta_bytes": None})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+            entry["items"] += items
+            if peak_rss is not None:
+                entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"] or 0, peak_rss)
+            if peak_delta is not None:
+                entry["peak_delta_bytes"] = max(entry["peak_delta_bytes"] or 0, peak_delta)
+
+    def _start_sampler(self):
+        if self._sampler is None or not self._sampler.is_alive():
+            self._last_rss = rss_bytes()
+            self._sampler = threading.Thread(target=self._sample, name="metrics-sampler", daemon=True)
+            self._sampler.start()
+
+    def _sample(self):
+        while True:
+            time.sleep(self.sample_interval)
+            rss = rss_bytes()
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                if rss is None:
+                    continue
+                self._last_rss = rss
+                for token, peak in self._active.items():
+                    if peak is None or rss > peak:
+                        self._active[token] = rss
+
+    def report(self):
+        with self._lock:
+            return {
+                stage: dict(entry, items_per_s=entry["items"] / entry["seconds"] if entry["seconds"] else None)
+                for stage, entry in self._stages.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def prometheus(self, prefix="onesight_stage"):
+        """The report in the Prometheus text exposition format."""
+        series = (
+            ("seconds_total", "counter", "Wall time spent in the stage", "seconds"),
+            ("calls_total", "counter", "Calls of the stage", "calls"),
+            ("items_total", "counter", "Items processed by the stage", "items"),
+            ("peak_rss_bytes", "gauge", "Highest process RSS seen while the stage ran", "peak_rss_bytes"),
+            ("peak_delta_bytes", "gauge", "Largest RSS growth within one call of the stage", "peak_delta_bytes"),
+        )
+        report = self.report()
+        lines = []
+        for suffix, kind, help_text, key in series:
+            lines.append(f"# HELP {prefix}_{suffix} {help_text}")
+            lines.append(f"# TYPE {prefix}_{suffix} {kind}")
+            for stage, entry in sorted(report.items()):
+                if entry[key] is not None:
+                    lines.append(f'{prefix}_{suffix}{{stage="{stage}"}} {entry[key]}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Metrics()
+
+
+def track(stage, items=1):
+    return REGISTRY.track(stage, items)
+
+
+def report():
+    return REGISTRY.report()
+
+
+def log_report(stages=None, **context):
+    """Log one JSON record per stage (default: the whole registry) on the ``onesight.metrics`` logger."""
+    for stage, entry in (report() if stages is None else stages).items():
+        logger.info(json.dumps(dict(context, stage=stage, **entry)))
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def serve_prometheus(port, registry=REGISTRY):
+    """Serve ``registry.prometheus()`` on ``/metrics`` from a daemon thread, once per port and process."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    with _servers_lock:
+        if port in _servers:
+            return _servers[port]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _servers[port] = server
+        return server
+
+
+def since(before, after=None):
+    """Per-stage counters accumulated between two ``report()`` snapshots; peaks are taken from ``after``."""
+    after = report() if after is None else after
+    delta = {}
+    for stage, entry in after.items():
+        previous = before.get(stage, {})
+        calls = entry["calls"] - previous.get("calls", 0)
+        if calls:
+            seconds = entry["seconds"] - previous.get("seconds", 0.0)
+            items = entry["items"] - previous.get("items", 0)
+            delta[stage] = dict(entry, seconds=seconds, calls=calls, items=items,
+                                items_per_s=items / seconds if seconds else None)
+    return delta
+
+
+class Profile:
+    """cProfile of one request, started and stopped explicitly. Only the calling thread is profiled."""
+
+    def __init__(self, name="run", output_dir=PROFILE_DIR, limit=25):
+        self.name = name
+        self.output_dir = output_dir
+        self.limit = limit
+        self.path = None
+        self.summary = None
+        self._profiler = cProfile.Profile()
+
+    def start(self):
+        self._profiler.enable()
+        return self
+
+    def stop(self):
+        """Save the .prof file and keep the top ``limit`` functions by cumulative time in ``summary``."""
+        self._profiler.disable()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.path = os.path.join(self.output_dir, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        self._profiler.dump_stats(self.path)
+        summary = io.StringIO()
+        pstats.Stats(self._profiler, stream=summary).sort_stats("cumulative").print_stats(self.limit)
+        self.summary = summary.getvalue()
+        return self
+
+
+@contextmanager
+def profile(name="run", enabled=True, **kwargs):
+    """Profile the body when ``enabled``; yields the Profile (or None)."""
+    if not enabled:
+        yield None
+        return
+    run = Profile(name, **kwargs).start()
+    try:
+        yield run
+    finally:
+        run.stop()
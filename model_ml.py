@@ -1,12 +1,72 @@
+import os
+
+import numpy as np
 import xgboost as xgb
 
-def load_model(path='xgb_model.json'):
+import model_registry
+
+# Shipped next to this module, so the model loads from any working directory
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xgb_model.json')
+# P(positive) above THRESHOLD is positive; within NEUTRAL_BAND of it, predict_labels says neutral
+THRESHOLD = float(os.getenv("SENTIMENT_THRESHOLD", "0.5"))
+NEUTRAL_BAND = float(os.getenv("SENTIMENT_NEUTRAL_BAND", "0"))
+NTHREAD = int(os.getenv("XGB_NTHREAD", "0"))
+
+def load_model(path=MODEL_PATH):
     model = xgb.XGBClassifier()
     model.load_model(path)
     return model
 
-model = load_model()
+
+class InferenceEngine:
+    """Booster loaded once and queried with inplace_predict on contiguous float32 input."""
+
+    def __init__(self, path=MODEL_PATH, nthread=NTHREAD, threshold=THRESHOLD, neutral_band=NEUTRAL_BAND):
+        self.booster = xgb.Booster()
+        self.booster.load_model(path)
+        if nthread:
+            self.booster.set_param({"nthread": nthread})
+        self.threshold = threshold
+        self.neutral_band = neutral_band
+
+    def predict_proba(self, input_data):
+        """P(positive) for every row."""
+        X = np.ascontiguousarray(input_data, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 0:
+            return np.empty(0, dtype=np.float32)
+        return self.booster.inplace_predict(X)
+
+    def predict(self, input_data, threshold=None):
+        """Hard 0/1 labels; with the default threshold this matches XGBClassifier.predict."""
+        threshold = self.threshold if threshold is None else threshold
+        return (self.predict_proba(input_data) > threshold).astype(np.int64)
+
+    def predict_labels(self, input_data, threshold=None, neutral_band=None):
+        """"positive", "negative" or "neutral" (probability within neutral_band of the threshold)."""
+        threshold = self.threshold if threshold is None else threshold
+        neutral_band = self.neutral_band if neutral_band is None else neutral_band
+        proba = self.predict_proba(input_data)
+        labels = np.where(proba > threshold, "positive", "negative").astype(object)
+        if neutral_band > 0:
+            labels[np.abs(proba - threshold) < neutral_band] = "neutral"
+        return labels
+
+
+@model_registry.register("xgboost")
+def _load_engine():
+    return InferenceEngine()
+
+
+def get_engine():
+    return model_registry.get("xgboost")
+
 
 def predict(input_data):
-    output = model.predict(input_data)
-    return output
\ No newline at end of file
+    output = get_engine().predict(input_data)
+    return output
+
+
+def predict_proba(input_data):
+    return get_engine().predict_proba(input_data)
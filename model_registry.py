@@ -0,0 +1,104 @@
+import importlib
+import threading
+import time
+
+from metrics import rss_bytes
+
+# Process-wide registry of heavy models. Streamlit keeps imported modules alive
+# across reruns and sessions, so anything loaded here is loaded once per process.
+
+_loaders = {}
+_models = {}
+_load_stats = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+# Modules that register each model. Looking up a model imports its owner on
+# demand, so callers (and warm-up) never need the heavy module imported up front.
+MODEL_OWNERS = {
+    "sentence_embedding": "embedding",
+    "xgboost": "model_ml",
+    "easyocr": "image_model",
+    "blip": "image_model",
+    "marian": "image_model",
+    "caption_engine": "image_model",
+    "nemo_asr": "vid_model",
+    "gemini_client": "Text_Generation",
+}
+
+
+def register(name, loader=None):
+    """Register a zero-argument loader under ``name``. Usable as a decorator."""
+    def decorator(fn):
+        with _registry_lock:
+            _loaders[name] = fn
+            _locks.setdefault(name, threading.Lock())
+        return fn
+
+    if loader is not None:
+        return decorator(loader)
+    return decorator
+
+
+def get(name):
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    if name not in _loaders and name in MODEL_OWNERS:
+        importlib.import_module(MODEL_OWNERS[name])
+
+    with _registry_lock:
+        if name not in _loaders:
+            raise KeyError(f"No model registered under '{name}'")
+        lock = _locks[name]
+
+    with lock:
+        # Another thread may have finished loading while we waited
+        model = _models.get(name)
+        if model is not None:
+            return model
+
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        model = _loaders[name]()
+        elapsed = time.perf_counter() - start
+        rss_after = rss_bytes()
+
+        _load_stats[name] = {
+            "load_seconds": elapsed,
+            "rss_delta_mb": (rss_after - rss_before) / 2**20 if rss_before is not None and rss_after is not None else None,
+            "rss_after_mb": rss_after / 2**20 if rss_after is not None else None,
+        }
+        _models[name] = model
+        print(f"[INFO] Loaded model '{name}' in {elapsed:.1f}s")
+        return model
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def registered():
+    with _registry_lock:
+        return sorted(set(_loaders) | set(MODEL_OWNERS))
+
+
+def warm_up(names=None):
+    names = registered() if names is None else names
+    for name in names:
+        get(name)
+
+
+def unload(name):
+    with _registry_lock:
+        lock = _locks.get(name)
+    if lock is None:
+        return
+    with lock:
+        _models.pop(name, None)
+        _load_stats.pop(name, None)
+
+
+def stats():
+    return {name: dict(values) for name, values in _load_stats.items()}
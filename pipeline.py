@@ -0,0 +1,410 @@
+"""Headless analysis pipeline: file-type dispatch → text extraction → preprocess → embed → predict → summary.
+
+Used by the Streamlit dashboard and runnable as a batch tool:
+
+    python pipeline.py exports/ "uploads/**/*.jpg" -o results/ --workers 4 --video-workers 2 --format parquet
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import time
+
+import metrics
+from dedup import DEFAULT_THRESHOLD as DEDUP_THRESHOLD, make_index
+from ingest import DEFAULT_CHUNK_SIZE, REVIEW_FILE_EXTENSIONS, StreamingSentiment, iter_comments
+from scheduler import DEFAULT_WORKERS, FileScheduler
+
+TEXT_EXTENSIONS = (".txt",)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+VIDEO_EXTENSIONS = (".mp4", ".mov")
+SUPPORTED_EXTENSIONS = REVIEW_FILE_EXTENSIONS + TEXT_EXTENSIONS + IMAGE_EXTENSIONS + VIDEO_EXTENSIONS
+# Images per extraction job; OCR and the captioning fallback run on a job's images together
+IMAGE_JOB_SIZE = int(os.getenv("IMAGE_JOB_SIZE", "8"))
+
+
+# ============================================
+# 1. File-type dispatch and text extraction
+# ============================================
+def modality(filename):
+    name = filename.lower()
+    if name.endswith(REVIEW_FILE_EXTENSIONS):
+        return "reviews"
+    if name.endswith(TEXT_EXTENSIONS):
+        return "text"
+    if name.endswith(IMAGE_EXTENSIONS):
+        return "image"
+    if name.endswith(VIDEO_EXTENSIONS):
+        return "video"
+    return None
+
+
+def extract_texts(fileobj, filename, on_partial=None):
+    """Yield the texts to classify from one file. Review files stream one comment at a time.
+
+    For videos, ``on_partial(text)`` receives the transcript so far while it is produced.
+    """
+    kind = modality(filename)
+    if kind == "reviews":
+        yield from iter_comments(fileobj, filename)
+    elif kind == "text":
+        with metrics.track("decode"):
+            content = fileobj.read()
+            content = content.decode("utf-8") if isinstance(content, bytes) else content
+        yield content
+    elif kind == "image":
+        from image_model import arabic_text_from_image
+        yield arabic_text_from_image(fileobj)
+    elif kind == "video":
+        from vid_model import get_transcript
+        yield get_transcript(fileobj, on_partial)
+    else:
+        raise ValueError(f"Unsupported file type: {filename}")
+
+
+def extract_image_batch(images):
+    """``[text]`` for each image (path, bytes or file object), or the exception it raised.
+
+    When one image breaks the batch, the images are retried one at a time so
+    only that one fails.
+    """
+    from image_model import arabic_texts_from_images
+    try:
+        return [[text] for text in arabic_texts_from_images(images)]
+    except Exception:
+        results = []
+        for image in images:
+            if hasattr(image, "seek"):
+                image.seek(0)
+            try:
+                results.append([arabic_texts_from_images([image])[0]])
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def group_files(filenames, image_job_size=IMAGE_JOB_SIZE):
+    """Split file indices into extraction jobs: images in runs of ``image_job_size``, every other file alone.
+
+    A run of images takes the place of its first image, so the jobs keep the input order otherwise.
+    """
+    groups, images = [], []
+    for index, filename in enumerate(filenames):
+        if modality(filename) != "image":
+            groups.append([index])
+            continue
+        if not images:
+            groups.append(images)
+        images.append(index)
+        if len(images) >= image_job_size:
+            images = []
+    return groups
+
+
+def expand_inputs(inputs):
+    """Resolve files, directories (searched recursively) and glob patterns to supported files."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.extend(os.path.join(root, f) for f in sorted(files))
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            paths.extend(sorted(glob.glob(item, recursive=True)))
+    return [p for p in dict.fromkeys(paths) if modality(p) is not None]
+
+
+# ============================================
+# 2. Pipeline
+# ============================================
+def _extract_paths(paths):
+    # Runs in a worker thread or process; timing is recorded by the caller
+    start = time.perf_counter()
+    if modality(paths[0]) == "image":
+        results = extract_image_batch(paths)
+    else:
+        results = []
+        for path in paths:
+            with open(path, "rb") as f:
+                results.append(list(extract_texts(f, path)))
+    return results, time.perf_counter() - start
+
+
+def extraction_jobs(paths):
+    """Scheduler jobs for ``paths`` and the paths each job covers.
+
+    Images are batched (see ``group_files``); review exports are left inline
+    so they keep streaming.
+    """
+    groups = [[paths[i] for i in group] for group in group_files(paths)]
+    jobs = [
+        (modality(group[0]), None if modality(group[0]) == "reviews" else _extract_paths, (group,))
+        for group in groups
+    ]
+    return jobs, groups
+
+
+def stream_reviews(fileobj, filename, sentiment, stages):
+    comments = iter_comments(fileobj, filename)
+    while True:
+        with stages.track("extract") as call:
+            comment = next(comments, None)
+            if comment is None:
+                call["items"] = 0
+        if comment is None:
+            break
+        sentiment.add(comment, filename)
+
+
+def analyze_paths(paths, workers=None, executor="thread", chunk_size=DEFAULT_CHUNK_SIZE, summarize=False,
+                  on_prediction=None, stages=None, dedup_threshold=DEDUP_THRESHOLD):
+    """Classify every supported file in ``paths`` and return counts, per-file results and stage timings.
+
+    Images, videos and text files are extracted on per-modality pools sized by
+    ``workers`` (see scheduler.DEFAULT_WORKERS); review exports are streamed in
+    the calling thread. Files are fed to the classifier in job order, so
+    results do not depend on the worker counts.
+    """
+    from embedding import EMBEDDING_DIM, embed_batch
+    from model_ml import predict
+
+    # Stages recorded inside the OCR/ASR/Gemini modules always go to metrics.REGISTRY
+    stages = stages or metrics.REGISTRY
+    stages_before = stages.report()
+    sentiment = StreamingSentiment(embed_batch, predict, chunk_size=chunk_size, stages=stages, on_prediction=on_prediction,
+                                   dedup=make_index(EMBEDDING_DIM, dedup_threshold))
+    errors = {}
+    start = time.perf_counter()
+
+    def fail(path, e):
+        print(f"[ERROR] {path}: {e}", file=sys.stderr)
+        errors[path] = str(e)
+        # A review export that broke partway must not leave its first comments in the totals
+        sentiment.discard(path)
+
+    jobs, groups = extraction_jobs(paths)
+    with FileScheduler(workers, executor) as scheduler:
+        for index, future in scheduler.run(jobs):
+            group = groups[index]
+            if future is None:
+                try:
+                    with open(group[0], "rb") as f:
+                        stream_reviews(f, group[0], sentiment, stages)
+                except Exception as e:
+                    fail(group[0], e)
+                continue
+            try:
+                results, seconds = future.result()
+            except Exception as e:
+                for path in group:
+                    fail(path, e)
+                continue
+            stages.add("extract", seconds, sum(len(texts) for texts in results if not isinstance(texts, Exception)))
+            for path, texts in zip(group, results):
+                try:
+                    if isinstance(texts, Exception):
+                        raise texts
+                    sentiment.add_stream(texts, path)
+                except Exception as e:
+                    fail(path, e)
+
+    sentiment.flush()
+
+    summaries = None
+    if summarize and sentiment.total:
+        from summarization import summarize_points
+        with stages.track("summary", 2):
+            positive_text, negative_text, report = summarize_points(sentiment.reviews["positive"], sentiment.reviews["negative"])
+            summaries = {"positive": positive_text, "negative": negative_text, "requests": report}
+
+    return {
+        "counts": dict(sentiment.counts),
+        "total": sentiment.total,
+        "files": sentiment.file_counts,
+        # Non-Arabic comments, which are counted but not classified
+        "unclassified": sentiment.unclassified,
+        "file_unclassified": sentiment.file_unclassified,
+        "errors": errors,
+        "summaries": summaries,
+        "dedup": sentiment.dedup.stats() if sentiment.dedup is not None else None,
+        "stages": metrics.since(stages_before, stages.report()),
+        "wall_seconds": time.perf_counter() - start,
+    }
+
+
+# ============================================
+# 3. Output
+# ============================================
+def file_records(result):
+    records = []
+    for path in dict.fromkeys([*result["files"], *result["file_unclassified"]]):
+        counts = result["files"].get(path, {"positive": 0, "negative": 0})
+        items = counts["positive"] + counts["negative"]
+        records.append({
+            "file": path,
+            "modality": modality(path),
+            "items": items,
+            "positive": counts["positive"],
+            "negative": counts["negative"],
+            "unclassified": result["file_unclassified"].get(path, 0),
+            "label": ("positive" if counts["positive"] >= counts["negative"] else "negative") if items else None,
+        })
+    return records
+
+
+def aggregate_record(result):
+    total = result["total"]
+    return {
+        "files": len(set(result["files"]) | set(result["file_unclassified"])),
+        "items": total,
+        "positive": result["counts"]["positive"],
+        "negative": result["counts"]["negative"],
+        "unclassified": result["unclassified"],
+        "positive_percentage": int(result["counts"]["positive"] / total * 100) if total else None,
+        "errors": result["errors"],
+        "summaries": result["summaries"],
+        "dedup": result["dedup"],
+        "stages": result["stages"],
+        "wall_seconds": result["wall_seconds"],
+    }
+
+
+def write_records(records, path, fmt):
+    with RecordWriter(path, fmt) as writer:
+        for record in records:
+            writer.write(record)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(f"Parquet output needs pyarrow: {e}") from e
+    return pyarrow, pyarrow.parquet
+
+
+class RecordWriter:
+    """Append records to a JSONL or Parquet file as they arrive.
+
+    Parquet rows are buffered and written as row groups of ``batch_size``,
+    so memory stays bounded however many records are written. Nested values
+    (stage timings, summaries, errors) are stored in Parquet as JSON strings.
+    ``schema`` maps column names to pyarrow type names ("string", "int64");
+    without it the types are inferred from the first row group.
+    """
+
+    def __init__(self, path, fmt, batch_size=DEFAULT_CHUNK_SIZE, schema=None):
+        self.batch_size = batch_size
+        self._schema = schema
+        self._rows = []
+        self._parquet = None
+        self._file = None
+        if fmt == "parquet":
+            self._pa, self._pq = _import_pyarrow()
+            self._path = path
+            if schema is not None:
+                self._schema = self._pa.schema([(name, getattr(self._pa, kind)()) for name, kind in schema.items()])
+        else:
+            self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, record):
+        if self._file is not None:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        self._rows.append({
+            k: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v for k, v in record.items()
+        })
+        if len(self._rows) >= self.batch_size:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        table = self._pa.Table.from_pylist(self._rows, schema=self._schema)
+        if self._parquet is None:
+            self._parquet = self._pq.ParquetWriter(self._path, table.schema)
+        self._parquet.write_table(table)
+        self._rows = []
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            return
+        if self._rows or self._parquet is None:
+            self._write_row_group()
+        self._parquet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the One Sight sentiment pipeline over files, directories or globs.")
+    parser.add_argument("inputs", nargs="+", help="files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="results", help="output directory")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"workers for image and text extraction (default {DEFAULT_WORKERS['image']} and {DEFAULT_WORKERS['text']})")
+    parser.add_argument("--video-workers", type=int, default=DEFAULT_WORKERS["video"], help="workers for video transcription")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="comments per embed/predict batch")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD,
+                        help="cosine similarity for collapsing near-duplicate comments (0 disables)")
+    parser.add_argument("--per-item", action="store_true", help="also write one prediction per comment")
+    parser.add_argument("--summarize", action="store_true", help="generate positive/negative points with Gemini")
+    parser.add_argument("--profile", action="store_true", help=f"cProfile the run and save it under {metrics.PROFILE_DIR}")
+    args = parser.parse_args(argv)
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        sys.exit("No supported files found")
+    os.makedirs(args.output, exist_ok=True)
+    if args.format == "parquet":
+        # Fail before the run rather than after it
+        try:
+            _import_pyarrow()
+        except ImportError as e:
+            sys.exit(str(e))
+
+    ext = "parquet" if args.format == "parquet" else "jsonl"
+    workers = {"video": args.video_workers}
+    if args.workers is not None:
+        workers.update(image=args.workers, text=args.workers)
+
+    # Per-item predictions are written as each chunk is classified rather than held until the end
+    with contextlib.ExitStack() as stack:
+        on_prediction = None
+        if args.per_item:
+            # label is None for unclassified comments, so its type cannot be inferred
+            schema = {"file": "string", "text": "string", "label": "string"}
+            items_path = os.path.join(args.output, f"items.{ext}")
+            items = stack.enter_context(RecordWriter(items_path, args.format, args.chunk_size, schema=schema))
+
+            def on_prediction(filename, text, label):
+                items.write({"file": filename, "text": text, "label": label})
+
+        with metrics.profile("pipeline", enabled=args.profile) as run_profile:
+            result = analyze_paths(paths, workers=workers, executor=args.executor, chunk_size=args.chunk_size,
+                                   summarize=args.summarize, on_prediction=on_prediction,
+                                   dedup_threshold=args.dedup_threshold)
+    metrics.log_report(result["stages"], source="pipeline")
+
+    write_records(file_records(result), os.path.join(args.output, f"predictions.{ext}"), args.format)
+    write_records([aggregate_record(result)], os.path.join(args.output, f"aggregate.{ext}"), args.format)
+
+    for stage, entry in result["stages"].items():
+        rate = f"{entry['items_per_s']:.1f} items/s" if entry["items_per_s"] else "n/a"
+        peak = f"{entry['peak_rss_bytes'] / 2**20:.0f} MB peak" if entry["peak_rss_bytes"] else ""
+        print(f"{stage:<12} {entry['items']:>8} items  {entry['seconds']:8.2f}s  {rate:>16}  {peak}")
+    print(f"{len(paths)} files, {result['total']} items in {result['wall_seconds']:.2f}s")
+    if run_profile is not None:
+        print(f"Profile saved to {run_profile.path}")
+
+
+if __name__ == "__main__":
+    main()
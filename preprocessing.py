@@ -1,6 +1,8 @@
 import re
 import emoji
+from multiprocessing import Pool
 from pyarabic.araby import strip_tatweel, strip_tashkeel, normalize_ligature, normalize_hamza
+from pyarabic.araby import ALEF, ALEF_MADDA, HAMZA, HARAKAT, LAM, SHADDA, TASHKEEL, TATWEEL
 
 
 # ============================================
@@ -29,9 +31,10 @@ def normalize_text(text):
 # 2. Handle Negation
 # ============================================
 negation_patterns = r'\b(مش|ما|لا|غير|مو|مفيش|محدش|ليس|ماعند|ماعنديش)\b'
+negation_re = re.compile(negation_patterns)
 def handle_negation(text):
 
-    return re.sub(negation_patterns, 'لا', text)
+    return negation_re.sub('لا', text)
 
 # ============================================
 # 4. Emoji Handling (Arabic Descriptions)
@@ -72,8 +75,9 @@ def is_arabic_text(text):
 # 6. Numbers & Punctuation
 # ============================================
 
+punctuation_re = re.compile(r'[!"#$%&\'()*+,\-./:;<=>?@[\\]^_`{|}~،؛؟«»ـ]')
 def remove_punctuation(text):
-    return re.sub(r'[!"#$%&\'()*+,\-./:;<=>?@[\\]^_`{|}~،؛؟«»ـ]', ' ', text)
+    return punctuation_re.sub(' ', text)
 
 def handle_numbers(text, mode='convert'):
     text = re.sub(r'\d+', lambda m: m.group().translate(str.maketrans('0123456789', '٠١٢٣٤٥٦٧٨٩')), text)
@@ -87,6 +91,8 @@ def handle_numbers(text, mode='convert'):
     return text
 
 def preprocess(text):
+    if text is None:
+        return None
     text = handle_emojis(text)
     if not is_arabic_text(text):
         return None
@@ -94,4 +100,65 @@ def preprocess(text):
     text = handle_negation(text)
     text = remove_punctuation(text)
     text = handle_numbers(text, mode='remove')
-    return text
\ No newline at end of file
+    return text
+
+# ============================================
+# 7. Batch Pipeline
+# ============================================
+# Same output as preprocess(), but every per-character step is folded into
+# precompiled str.translate tables built once at import time.
+
+# Only single code point emojis can match the per-character check in handle_emojis
+_emoji_table = {
+    ord(c): emoji_arabic_map.get(c, '')
+    for c in emoji.EMOJI_DATA if len(c) == 1
+}
+
+_non_arabic_table = dict.fromkeys(range(0x0600, 0x0700))
+
+_ligature_table = dict.fromkeys(map(ord, 'ﻻﻷﻹﻵ'), LAM + ALEF)
+
+# normalize_ligature, normalize_hamza (uniform), strip_tashkeel, strip_tatweel,
+# the letter replacements of normalize_text and the digit conversion of handle_numbers
+_normalize_table = dict(_ligature_table)
+_normalize_table[ord(ALEF_MADDA)] = HAMZA + HAMZA
+_normalize_table.update(dict.fromkeys(map(ord, 'ءؤئٕٔإأ'), HAMZA))
+_normalize_table.update(dict.fromkeys(map(ord, TASHKEEL + (TATWEEL,))))
+_normalize_table.update({
+    ord('ٱ'): 'ا', ord('ى'): 'ي', ord('ة'): 'ه', ord('گ'): 'ك',
+    ord('ڤ'): 'ف', ord('ڨ'): 'ف', ord('چ'): 'ج', ord('پ'): 'ب',
+})
+_normalize_table.update(str.maketrans('0123456789', '٠١٢٣٤٥٦٧٨٩'))
+
+def _normalize_leading_madda(text):
+    # normalize_hamza treats an initial madda differently from the rest of the word
+    text = text.translate(_ligature_table)
+    if len(text) >= 3 and text[1] not in HARAKAT and (text[2] == SHADDA or len(text) == 3):
+        return HAMZA + ALEF + text[1:]
+    return HAMZA + HAMZA + text[1:]
+
+def preprocess_fast(text):
+    if text is None:
+        return None
+    text = text.translate(_emoji_table)
+    arabic_chars = len(text) - len(text.translate(_non_arabic_table))
+    if arabic_chars / max(1, len(text)) <= 0.4:
+        return None
+    if text[0] == ALEF_MADDA:
+        text = _normalize_leading_madda(text)
+    text = text.translate(_normalize_table)
+    text = negation_re.sub('لا', text)
+    text = punctuation_re.sub(' ', text)
+    return text
+
+def preprocess_batch(texts, processes=None, min_parallel_items=20000, chunksize=2000):
+    """Preprocess many texts, returning the same list preprocess() would.
+
+    With ``processes`` set and at least ``min_parallel_items`` texts, the work
+    is spread over a multiprocessing pool.
+    """
+    texts = list(texts)
+    if processes and processes > 1 and len(texts) >= min_parallel_items:
+        with Pool(processes) as pool:
+            return pool.map(preprocess_fast, texts, chunksize=chunksize)
+    return [preprocess_fast(text) for text in texts]
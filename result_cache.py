@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+READ_SIZE = 1 << 20
+
+
+def hash_media(media):
+    """sha256 of a path, bytes or file object. File objects are rewound afterwards."""
+    digest = hashlib.sha256()
+    if isinstance(media, bytes):
+        digest.update(media)
+    elif isinstance(media, str):
+        with open(media, "rb") as f:
+            for block in iter(lambda: f.read(READ_SIZE), b""):
+                digest.update(block)
+    else:
+        start = media.tell()
+        for block in iter(lambda: media.read(READ_SIZE), b""):
+            digest.update(block)
+        media.seek(start)
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """Extracted text (transcripts, OCR) keyed by media content hash and model identifier.
+
+    Entries live in a small SQLite file. When the stored text exceeds
+    ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, max_bytes=256 * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " content_hash TEXT, model_id TEXT, kind TEXT, text TEXT,"
+                " size INTEGER, accessed REAL, PRIMARY KEY (content_hash, model_id))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, content_hash, model_id):
+        with self._lock, self._connect() as db:
+            row = db.execute(
+                "SELECT text FROM results WHERE content_hash = ? AND model_id = ?",
+                (content_hash, model_id),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute(
+                "UPDATE results SET accessed = ? WHERE content_hash = ? AND model_id = ?",
+                (time.time(), content_hash, model_id),
+            )
+            self.hits += 1
+            return row[0]
+
+    def put(self, content_hash, model_id, kind, text):
+        size = len(text.encode("utf-8"))
+        with self._lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, model_id, kind, text, size, time.time()),
+            )
+            self._evict(db)
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = db.execute("SELECT content_hash, model_id, size FROM results ORDER BY accessed").fetchall()
+        for content_hash, model_id, size in rows:
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM results WHERE content_hash = ? AND model_id = ?", (content_hash, model_id))
+            total -= size
+
+    def invalidate(self, kind=None, keep_model_id=None):
+        """Drop entries of ``kind`` (or all kinds), except those produced by ``keep_model_id``."""
+        query = "DELETE FROM results WHERE 1 = 1"
+        params = []
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        if keep_model_id is not None:
+            query += " AND model_id != ?"
+            params.append(keep_model_id)
+        with self._lock, self._connect() as db:
+            return db.execute(query, params).rowcount
+
+    def stats(self):
+        with self._lock, self._connect() as db:
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_store():
+    """Process-wide store under MEDIA_CACHE_DIR, or None when MEDIA_CACHE_DIR is set to an empty string."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            cache_dir = os.getenv("MEDIA_CACHE_DIR", "./cache/media")
+            if not cache_dir:
+                return None
+            max_mb = float(os.getenv("MEDIA_CACHE_MAX_MB", "256"))
+            _default_store = ResultStore(os.path.join(cache_dir, "results.sqlite3"), max_bytes=int(max_mb * 2**20))
+        return _default_store
+
+
+def cached_extraction(media, kind, model_id, extract):
+    """Return ``extract()`` for ``media``, served from the default store when the same bytes were seen before."""
+    store = default_store()
+    if store is None:
+        return extract()
+
+    content_hash = hash_media(media)
+    text = store.get(content_hash, model_id)
+    if text is not None:
+        return text
+
+    text = extract()
+    if text is not None:
+        store.put(content_hash, model_id, kind, text)
+    return text
+
+
+def main(argv=None):
+    """Maintenance for the default store. Entries of older model ids are otherwise only dropped by LRU eviction."""
+    parser = argparse.ArgumentParser(description="Inspect or prune the media result cache under MEDIA_CACHE_DIR.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="print the number and size of cached texts")
+    invalidate = commands.add_parser("invalidate", help="drop cached transcripts and image texts")
+    invalidate.add_argument("--kind", choices=["image", "video"], help="only drop entries of this kind")
+    invalidate.add_argument("--keep-model-id", help="keep the entries produced by this model id")
+    args = parser.parse_args(argv)
+
+    store = default_store()
+    if store is None:
+        sys.exit("MEDIA_CACHE_DIR is empty, so there is no media cache")
+    if args.command == "stats":
+        print(json.dumps(store.stats()))
+    else:
+        print(f"Removed {store.invalidate(args.kind, args.keep_model_id)} entries")
+
+
+if __name__ == "__main__":
+    main()
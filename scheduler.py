@@ -0,0 +1,100 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# Separate pools per modality so a long ASR job never holds up OCR or text files.
+# Review exports are streamed by the caller, so they get no pool.
+DEFAULT_WORKERS = {"video": 1, "image": 2, "text": 4}
+
+
+def parse_workers(spec):
+    """Parse ``"video=1,image=4"`` into a workers dict."""
+    workers = {}
+    for part in (spec or "").split(","):
+        if part.strip():
+            name, _, count = part.partition("=")
+            workers[name.strip()] = int(count)
+    return workers
+
+
+class FileScheduler:
+    """Fan per-file jobs out over per-modality pools and hand results back in submission order.
+
+    ``executor="process"`` uses process pools, which needs picklable job
+    functions and arguments (e.g. file paths rather than open uploads).
+    """
+
+    def __init__(self, workers=None, executor="thread"):
+        self.workers = dict(DEFAULT_WORKERS, **(workers or {}))
+        self.executor = executor
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, modality):
+        with self._lock:
+            pool = self._pools.get(modality)
+            if pool is None:
+                size = max(1, self.workers.get(modality, 1))
+                if self.executor == "process":
+                    pool = ProcessPoolExecutor(max_workers=size)
+                else:
+                    pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{modality}-worker")
+                self._pools[modality] = pool
+            return pool
+
+    def run(self, jobs, on_update=None, poll_interval=0.25, on_poll=None):
+        """Yield ``(index, future)`` for each ``(modality, fn, args)`` job in the original order.
+
+        Jobs whose ``fn`` is None are not submitted; they are yielded with a
+        None future when their turn comes so the caller can handle them
+        inline. ``on_update(states)`` is called from the caller's thread
+        whenever a job changes between queued, running, done and failed,
+        and ``on_poll()`` every ``poll_interval`` seconds while waiting.
+        """
+        states = ["queued" if fn is not None else "inline" for _, fn, _ in jobs]
+        futures = []
+        for index, (modality, fn, args) in enumerate(jobs):
+            if fn is None:
+                futures.append(None)
+                continue
+            if self.executor == "process":
+                future = self._pool(modality).submit(fn, *args)
+            else:
+                future = self._pool(modality).submit(self._track, states, index, fn, args)
+            futures.append(future)
+
+        pending = {f for f in futures if f is not None}
+        reported = None
+        next_index = 0
+        while next_index < len(jobs):
+            for index, future in enumerate(futures):
+                if future is not None and future.done() and states[index] in ("queued", "running"):
+                    states[index] = "failed" if future.exception() is not None else "done"
+            if on_update is not None and states != reported:
+                reported = list(states)
+                on_update(reported)
+            if on_poll is not None:
+                on_poll()
+
+            while next_index < len(jobs) and (futures[next_index] is None or futures[next_index].done()):
+                yield next_index, futures[next_index]
+                next_index += 1
+
+            if next_index < len(jobs):
+                done, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+
+    @staticmethod
+    def _track(states, index, fn, args):
+        states[index] = "running"
+        return fn(*args)
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=True, cancel_futures=True)
+            self._pools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
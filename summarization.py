@@ -0,0 +1,188 @@
+import asyncio
+import math
+import os
+import time
+
+import numpy as np
+
+from Text_Generation import (
+    NO_NEGATIVE_REVIEWS,
+    NO_POSITIVE_REVIEWS,
+    build_negative_prompt,
+    build_positive_prompt,
+    generate_text_async,
+)
+
+# Rough prompt size limits, in estimated tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("SUMMARY_PROMPT_TOKENS", "12000"))
+SHARD_TOKEN_BUDGET = int(os.getenv("SUMMARY_SHARD_TOKENS", "4000"))
+MAX_REPRESENTATIVES = int(os.getenv("SUMMARY_MAX_REVIEWS", "300"))
+MAX_CONCURRENT_REQUESTS = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+
+
+def estimate_tokens(text):
+    # Gemini's tokenizer spends roughly one token per three characters of Arabic text
+    return math.ceil(len(text) / 3)
+
+
+def build_merge_prompt(partials, sentiment):
+    label = "إيجابية" if sentiment == "positive" else "سلبية"
+    points_text = "\n\n".join(partials)
+    prompt = f"""
+أنت صاحب مشروع تجاري. أمامك قوائم نقاط {label} تم استخراجها من مجموعات مختلفة من المراجعات.
+
+مهمتك هي دمج هذه القوائم في **أقصى حد ٤ نقاط** مميزة.
+- ادمج النقاط التي تشير إلى نفس المفهوم في نقطة واحدة.
+- لا تضف أي معلومة غير موجودة في القوائم.
+- قدّم النقاط الأكثر تكرارًا بين القوائم أولًا.
+- بداية كل نقطة يجب أن تكون - (شرطة ناقص) متبوعة بمسافة.
+
+القوائم:
+{points_text}
+"""
+    return prompt
+
+
+# ============================================
+# 1. Representative subset
+# ============================================
+def _kmeans(vectors, k, iterations=10, seed=0):
+    """Spherical k-means with k-means++ seeding. Returns (labels, centroids)."""
+    rng = np.random.default_rng(seed)
+    centroids = [vectors[rng.integers(len(vectors))]]
+    closest = 1.0 - vectors @ centroids[0]
+    for _ in range(1, k):
+        weights = np.clip(closest, 0, None) ** 2
+        total = weights.sum()
+        index = rng.choice(len(vectors), p=weights / total) if total > 0 else rng.integers(len(vectors))
+        centroids.append(vectors[index])
+        closest = np.minimum(closest, 1.0 - vectors @ vectors[index])
+    centroids = np.stack(centroids)
+
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(k):
+            members = vectors[labels == c]
+            if len(members):
+                mean = members.sum(axis=0)
+                centroids[c] = mean / max(np.linalg.norm(mean), 1e-12)
+    return np.argmax(vectors @ centroids.T, axis=1), centroids
+
+
+def select_representatives(reviews, embeddings, k=MAX_REPRESENTATIVES, seed=0):
+    """Drop exact duplicates, then keep the review closest to each of ``k`` clusters, largest clusters first."""
+    unique = {}
+    for i, review in enumerate(reviews):
+        unique.setdefault(" ".join(review.split()), i)
+    indices = list(unique.values())
+    if len(indices) <= k:
+        return [reviews[i] for i in indices]
+
+    vectors = np.asarray(embeddings, dtype=np.float32)[indices]
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    labels, centroids = _kmeans(vectors, k, seed=seed)
+
+    picked = []
+    for c in np.argsort(-np.bincount(labels, minlength=k)):
+        members = np.flatnonzero(labels == c)
+        if len(members):
+            best = members[np.argmax(vectors[members] @ centroids[c])]
+            picked.append(reviews[indices[best]])
+    return picked
+
+
+def shard_reviews(reviews, build_prompt, budget=SHARD_TOKEN_BUDGET):
+    """Split ``reviews`` into consecutive shards whose prompts stay within ``budget`` tokens."""
+    overhead = estimate_tokens(build_prompt([]))
+    shards, current, size = [], [], overhead
+    for review in reviews:
+        cost = estimate_tokens(f"- {review}\n")
+        if current and size + cost > budget:
+            shards.append(current)
+            current, size = [], overhead
+        current.append(review)
+        size += cost
+    if current:
+        shards.append(current)
+    return shards
+
+
+# ============================================
+# 2. Map-reduce
+# ============================================
+async def summarize_async(reviews, sentiment, embeddings=None, report=None, semaphore=None):
+    """Summarize ``reviews`` into at most four points, sharding when one prompt would exceed the budget.
+
+    ``semaphore`` caps the Gemini requests in flight; share one between
+    concurrent calls so the cap holds across them.
+    """
+    build_prompt = build_positive_prompt if sentiment == "positive" else build_negative_prompt
+    report = report if report is not None else []
+    semaphore = semaphore or asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    if not reviews:
+        return NO_POSITIVE_REVIEWS if sentiment == "positive" else NO_NEGATIVE_REVIEWS
+
+    prompt = build_prompt(reviews)
+    if estimate_tokens(prompt) <= PROMPT_TOKEN_BUDGET:
+        return (await _timed(report, sentiment, "single", [prompt], semaphore))[0]
+
+    if embeddings is None:
+        embeddings = await asyncio.to_thread(_embed, reviews)
+    start = time.perf_counter()
+    subset = select_representatives(reviews, embeddings)
+    report.append({"sentiment": sentiment, "stage": "select", "reviews": len(reviews),
+                   "representatives": len(subset), "seconds": time.perf_counter() - start})
+
+    prompt = build_prompt(subset)
+    if estimate_tokens(prompt) <= PROMPT_TOKEN_BUDGET:
+        return (await _timed(report, sentiment, "single", [prompt], semaphore))[0]
+
+    shards = shard_reviews(subset, build_prompt)
+    partials = await _timed(report, sentiment, "map", [build_prompt(shard) for shard in shards], semaphore)
+
+    # Reduce until the merged lists fit in one prompt
+    while True:
+        merge_prompt = build_merge_prompt(partials, sentiment)
+        groups = shard_reviews(partials, lambda p: build_merge_prompt(p, sentiment))
+        if estimate_tokens(merge_prompt) <= PROMPT_TOKEN_BUDGET or len(groups) >= len(partials):
+            return (await _timed(report, sentiment, "reduce", [merge_prompt], semaphore))[0]
+        partials = await _timed(report, sentiment, "reduce", [build_merge_prompt(g, sentiment) for g in groups], semaphore)
+
+
+async def _timed(report, sentiment, stage, prompts, semaphore):
+    async def run(prompt):
+        async with semaphore:
+            return await generate_text_async(prompt)
+
+    start = time.perf_counter()
+    outputs = await asyncio.gather(*(run(p) for p in prompts))
+    report.append({
+        "sentiment": sentiment,
+        "stage": stage,
+        "requests": len(prompts),
+        "prompt_tokens": sum(estimate_tokens(p) for p in prompts),
+        "output_tokens": sum(estimate_tokens(o or "") for o in outputs),
+        "seconds": time.perf_counter() - start,
+    })
+    return list(outputs)
+
+
+def _embed(reviews):
+    from embedding import embed_batch
+    from preprocessing import preprocess_batch
+    return embed_batch(preprocess_batch(reviews))
+
+
+async def summarize_points_async(positive_reviews, negative_reviews, positive_embeddings=None, negative_embeddings=None):
+    report = []
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    positive_text, negative_text = await asyncio.gather(
+        summarize_async(positive_reviews, "positive", positive_embeddings, report, semaphore),
+        summarize_async(negative_reviews, "negative", negative_embeddings, report, semaphore),
+    )
+    return positive_text, negative_text, report
+
+
+def summarize_points(positive_reviews, negative_reviews, positive_embeddings=None, negative_embeddings=None):
+    """Positive and negative points plus a per-stage token/latency report."""
+    return asyncio.run(summarize_points_async(positive_reviews, negative_reviews, positive_embeddings, negative_embeddings))
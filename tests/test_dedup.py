@@ -0,0 +1,41 @@
+import numpy as np
+
+from dedup import NearDuplicateIndex
+
+
+def unit_vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_exact_and_near_duplicates():
+    index = NearDuplicateIndex(16, threshold=0.95)
+    vectors = unit_vectors(3)
+    vectors = np.vstack([vectors, vectors[0] + 0.01, vectors[1]])
+    slots, new_slots = index.assign(["a", "b", "c", "d", "b"], vectors)
+    assert len(new_slots) == 3
+    assert slots[3] == slots[0] and slots[4] == slots[1]
+    assert index.stats() == {"items": 5, "exact_duplicates": 1, "near_duplicates": 1, "representatives": 3}
+
+
+def test_non_arabic_items_match_on_raw_text():
+    index = NearDuplicateIndex(16, threshold=0.95)
+    # Untranslatable comments all embed to the same vector
+    vectors = np.repeat(unit_vectors(1), 4, axis=0)
+    slots, new_slots = index.assign([None, None, None, "نص"], vectors, raw_texts=["great", "bad", "great", "نص"])
+    assert slots[0] == slots[2]
+    assert len({slots[0], slots[1], slots[3]}) == 3
+    assert len(new_slots) == 3
+
+
+def test_eviction_skips_slots_used_by_the_batch():
+    index = NearDuplicateIndex(16, threshold=0.999, max_items=4)
+    vectors = unit_vectors(8)
+    slots, new_slots = index.assign(list("abcd"), vectors[:4])
+    for slot, label in zip(new_slots, "abcd"):
+        index.labels[slot] = label
+    # "a" refers to slot 0, which is next in the ring; the new items must not take it
+    slots, new_slots = index.assign(["a", "e", "f"], np.vstack([vectors[0], vectors[4:6]]))
+    assert slots[0] not in new_slots
+    assert len(set(slots.tolist())) == 3
+    assert index.labels[slots[0]] == "a"
@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+def vectors(texts, dim=8):
+    return np.stack([np.full(dim, int(text[1:]), dtype=np.float32) for text in texts])
+
+
+def test_store_is_opened_on_first_use(tmp_path):
+    cache = EmbeddingCache("m", 8, cache_dir=str(tmp_path / "cache"))
+    assert not os.path.exists(tmp_path / "cache")
+    cache.get_or_compute(["t1"], vectors)
+    assert os.path.exists(tmp_path / "cache" / "m" / "keys.txt")
+
+
+def test_writers_sharing_a_store_stay_aligned(tmp_path):
+    # Two caches on one directory stand in for two processes
+    first = EmbeddingCache("m", 8, cache_dir=str(tmp_path), initial_capacity=2)
+    second = EmbeddingCache("m", 8, cache_dir=str(tmp_path), initial_capacity=2)
+    for start in range(0, 30, 3):
+        first.get_or_compute([f"t{i}" for i in range(start, start + 5)], vectors)
+        second.get_or_compute([f"t{i}" for i in range(start + 2, start + 7)], vectors)
+
+    with open(tmp_path / "m" / "keys.txt") as f:
+        keys = f.read().split()
+    assert len(keys) == len(set(keys))
+
+    reader = EmbeddingCache("m", 8, cache_dir=str(tmp_path))
+    texts = [f"t{i}" for i in range(32)]
+    np.testing.assert_array_equal(reader.get_or_compute(texts, vectors), vectors(texts))
+    assert reader.misses == 0
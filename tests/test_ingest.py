@@ -0,0 +1,156 @@
+import io
+import json
+import random
+
+import pytest
+
+from ingest import iter_json_lines, iter_json_reviews
+
+
+class ChunkedReader(io.RawIOBase):
+    """Binary file returning at most ``size`` bytes per read, like a slow socket."""
+
+    def __init__(self, data, size):
+        self.data = data
+        self.size = size
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        n = self.size if n is None or n < 0 else min(n, self.size)
+        block = self.data[self.pos:self.pos + n]
+        self.pos += len(block)
+        return block
+
+
+def reviews_from(document, size):
+    return list(iter_json_reviews(ChunkedReader(json.dumps(document, ensure_ascii=False).encode("utf-8"), size)))
+
+
+@pytest.mark.parametrize("size", range(1, 12))
+def test_number_split_at_read_boundary(size):
+    data = b'{"reviews": [1.5, -2e10, {"comment": "x"}, 0.25], "n": 12345.678}'
+    assert list(iter_json_reviews(ChunkedReader(data, size))) == ["x"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5])
+def test_multibyte_character_split_at_read_boundary(size):
+    document = {"reviews": [{"comment": "المنتج رائع 👍"}, {"comment": "سيء"}]}
+    assert reviews_from(document, size) == ["المنتج رائع 👍", "سيء"]
+
+
+def test_utf8_bom_and_other_keys():
+    data = "﻿" + json.dumps({"meta": {"a": [1, 2]}, "reviews": [{"comment": " حلو "}, {"other": 1}, "x"]})
+    assert list(iter_json_reviews(ChunkedReader(data.encode("utf-8"), 4))) == ["حلو"]
+
+
+def test_missing_reviews_list():
+    with pytest.raises(ValueError):
+        list(iter_json_reviews(io.BytesIO(b'{"items": []}')))
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 4096])
+def test_fuzz_matches_json_loads(size):
+    rng = random.Random(size)
+    alphabet = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي 👍😡\"\\\n0123456789.-e"
+
+    def scalar():
+        return rng.choice([
+            rng.randint(-10**6, 10**6),
+            rng.uniform(-1e3, 1e3),
+            rng.random() * 10 ** rng.randint(-20, 20),
+            True, False, None,
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20))),
+        ])
+
+    for _ in range(200):
+        items = []
+        for _ in range(rng.randint(0, 20)):
+            if rng.random() < 0.6:
+                items.append({"comment": scalar(), "rating": scalar()})
+            else:
+                items.append(scalar())
+        document = {"before": scalar(), "reviews": items, "after": [scalar(), scalar()]}
+        expected = [
+            str(item.get("comment", "") or "").strip()
+            for item in items if isinstance(item, dict)
+        ]
+        assert reviews_from(document, size) == [c for c in expected if c]
+
+
+def test_json_lines_binary_and_text():
+    lines = ['{"comment": "ممتاز"}', "", '"نص مباشر"', '{"comment": ""}', '{"other": 1}', '{"comment": " جيد "}']
+    expected = ["ممتاز", "نص مباشر", "جيد"]
+    data = ("﻿" + "\n".join(lines) + "\n").encode("utf-8")
+    assert list(iter_json_lines(io.BytesIO(data))) == expected
+    assert list(iter_json_lines(io.StringIO("\n".join(lines)))) == expected
+
+
+def test_json_lines_custom_field():
+    data = b'{"text": "a", "comment": "b"}\n{"text": "c"}\n'
+    assert list(iter_json_lines(io.BytesIO(data), field="text")) == ["a", "c"]
+
+
+def test_json_lines_invalid_line():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_lines(io.BytesIO(b'{"comment": "a"}\n{broken\n')))
+
+
+def test_reservoir_ignores_collapsed_duplicates():
+    import numpy as np
+    from dedup import NearDuplicateIndex
+    from ingest import StreamingSentiment
+
+    def embed_batch(texts):
+        return np.stack([np.random.default_rng(abs(hash(t)) % 2**32).standard_normal(16) for t in texts]).astype(np.float32)
+
+    sentiment = StreamingSentiment(embed_batch, lambda X: np.ones(len(X), dtype=int), max_reviews_per_label=100,
+                                   dedup=NearDuplicateIndex(16), per_file_reviews=True)
+    sentiment.add_stream([f"مراجعة قديمة {i}" for i in range(100)], "f")
+    sentiment.add_stream(["إعلان مكرر"] * 20000, "f")
+    sentiment.add_stream([f"مراجعة جديدة {i}" for i in range(1000)], "f")
+    sentiment.flush()
+    for kept in (sentiment.reviews["positive"], sentiment.file_reviews["f"]["positive"]):
+        late = sum(text.startswith("مراجعة جديدة") for text in kept)
+        assert late > 75
+
+
+def test_non_arabic_comments_are_not_classified():
+    import numpy as np
+    from ingest import StreamingSentiment
+
+    embedded = []
+
+    def embed_batch(texts):
+        embedded.extend(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    predictions = []
+    sentiment = StreamingSentiment(embed_batch, lambda X: np.ones(len(X), dtype=int),
+                                   on_prediction=lambda f, t, label: predictions.append(label))
+    sentiment.add_stream(["great app", "🦜🦜", "المنتج ممتاز"], "a")
+    sentiment.add_stream(["nice"], "b")
+    sentiment.flush()
+    assert None not in embedded and len(embedded) == 1
+    assert sentiment.counts == {"positive": 1, "negative": 0}
+    assert sentiment.unclassified == 3
+    assert sentiment.file_unclassified == {"a": 2, "b": 1}
+    assert "b" not in sentiment.file_counts
+    assert predictions == [None, None, "positive", None]
+
+
+def test_discard_removes_a_file():
+    import numpy as np
+    from ingest import StreamingSentiment
+
+    sentiment = StreamingSentiment(lambda texts: np.ones((len(texts), 4), dtype=np.float32),
+                                   lambda X: np.ones(len(X), dtype=int), max_reviews_per_label=5, per_file_reviews=True)
+    sentiment.add_stream([f"جيد {i}" for i in range(4)], "good")
+    sentiment.add_stream([f"سيء {i}" for i in range(6)] + ["bad"], "broken")
+    sentiment.discard("broken")
+    assert sentiment.counts == {"positive": 4, "negative": 0}
+    assert sentiment.unclassified == 0
+    assert set(sentiment.file_counts) == {"good"} and set(sentiment.file_reviews) == {"good"}
+    assert all(text.startswith("جيد") for text in sentiment.reviews["positive"])
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from preprocessing import emoji_arabic_map, preprocess, preprocess_batch, preprocess_fast
+
+CASES = [
+    None,
+    "",
+    " ",
+    "hello world",
+    # Leading madda, alone and before shadda or a short word
+    "آمن",
+    "آمّ",
+    "آم",
+    "آمن جدا",
+    "آﻻم",
+    "آ",
+    # Tatweel and diacritics
+    "العـــــربية",
+    "الْعَرَبِيّةُ",
+    "جـَمـِيـلٌ",
+    # Emojis, mapped and unmapped, single and multi code point
+    "ممتاز 👍",
+    "👍",
+    "❤️❤️ حلو",
+    "الخدمة 😡😡 سيئة",
+    "حلو 🦜",
+    "👨‍👩‍👧 عائلة",
+    # Presentation forms and ligatures
+    "ﻻ اعرف",
+    "ﻷ ﻹ ﻵ",
+    "ﺍﻟﺴﻼﻡ ﻋﻠﻴﻜﻢ",
+    "ﷺ ﷲ",
+    # Negation, numbers, punctuation and mixed script
+    "مش حلو خالص",
+    "مفيش خدمة 123",
+    "سعر ٥٠ جنيه و 20 دولار",
+    "إسلام أحمد ٱلله",
+    "گ ڤ ڨ چ پ",
+    "!!! رائع، جداً؟ «نعم»",
+    "abc مش",
+]
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_fast_path_matches_reference(text):
+    assert preprocess_fast(text) == preprocess(text)
+
+
+def test_fast_path_matches_reference_on_random_arabic_block():
+    rng = random.Random(0)
+    extras = " 0123456789!؟،.ﻻﻷﻹﻵ" + "".join(sorted(emoji_arabic_map))
+    alphabet = [chr(c) for c in range(0x0600, 0x0700)] + list(extras)
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 30)))
+        if rng.random() < 0.2:
+            text = "آ" + text
+        assert preprocess_fast(text) == preprocess(text), repr(text)
+
+
+def test_batch_matches_reference():
+    texts = [text for text in CASES] * 3
+    assert preprocess_batch(texts) == [preprocess(text) for text in texts]
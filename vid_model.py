@@ -1,17 +1,59 @@
+import io
 import os
+import queue
+import re
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import closing
+import numpy as np
 import torch
 import torchaudio
-from moviepy.editor import VideoFileClip
-import nemo.collections.asr as nemo_asr
 import tempfile
 
-
-def chunk_audio_tensor(audio_tensor, sample_rate=16000, chunk_duration=30):
+import metrics
+import model_registry
+import result_cache
+
+NVIDIA_MODEL = "nvidia/stt_ar_fastconformer_hybrid_large_pcd_v1.0"
+# At most VIDEO_MAX_SECONDS of audio is transcribed per video (0 = everything).
+# VIDEO_SAMPLING="head" keeps the beginning; "spread" transcribes
+# VIDEO_SEGMENT_SECONDS windows spaced evenly over the whole recording.
+MAX_SECONDS = float(os.getenv("VIDEO_MAX_SECONDS", "3600"))
+SAMPLING = os.getenv("VIDEO_SAMPLING", "spread")
+SEGMENT_SECONDS = float(os.getenv("VIDEO_SEGMENT_SECONDS", "120"))
+# Typical speaking rate, used to bound how many words two overlapping chunks can share
+SPEECH_WORDS_PER_SECOND = 2.5
+# Identifies transcripts in the media result cache; bump when chunking or decoding changes
+ASR_MODEL_ID = (
+    f"{NVIDIA_MODEL}|chunk=30|overlap=1.0|max={MAX_SECONDS:g}|{SAMPLING}={SEGMENT_SECONDS:g}"
+    f"|words_per_s={SPEECH_WORDS_PER_SECOND:g}"
+)
+
+
+@model_registry.register("nemo_asr")
+def _load_asr_model():
+    import nemo.collections.asr as nemo_asr
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    asr_model = nemo_asr.models.EncDecHybridRNNTCTCBPEModel.from_pretrained(
+        model_name=NVIDIA_MODEL
+    ).to(device)
+    asr_model.eval()
+    return asr_model
+
+
+def chunk_audio_tensor(audio_tensor, sample_rate=16000, chunk_duration=30, overlap_duration=0):
     samples_per_chunk = chunk_duration * sample_rate
+    # Consecutive chunks share overlap_duration seconds so words at the edges are heard whole
+    step = samples_per_chunk - int(overlap_duration * sample_rate)
+    if step <= 0:
+        raise ValueError("overlap_duration must be shorter than chunk_duration")
     num_samples = audio_tensor.size(0)
 
     chunks = []
-    for start in range(0, num_samples, samples_per_chunk):
+    for start in range(0, num_samples, step):
         end = start + samples_per_chunk
         chunk = audio_tensor[start:end]
 
@@ -21,25 +63,165 @@ def chunk_audio_tensor(audio_tensor, sample_rate=16000, chunk_duration=30):
 
         chunks.append(chunk)
 
+        if end >= num_samples:
+            break
+
     return chunks
 
 
+def _ffmpeg_exe():
+    # moviepy ships a static ffmpeg through imageio-ffmpeg; fall back to one on PATH
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg")
+
+
+def _read_exact(stream, num_bytes):
+    parts = []
+    while num_bytes > 0:
+        data = stream.read(num_bytes)
+        if not data:
+            break
+        parts.append(data)
+        num_bytes -= len(data)
+    return b"".join(parts)
+
+
+def media_duration(source):
+    """Duration of ``source`` in seconds as reported by ffmpeg, or None when unknown."""
+    exe = _ffmpeg_exe()
+    if exe is None:
+        return None
+    proc = subprocess.run([exe, "-nostdin", "-hide_banner", "-i", source], capture_output=True, text=True, errors="replace")
+    match = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", proc.stderr)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def plan_segments(duration, max_seconds=MAX_SECONDS, policy=SAMPLING, segment_seconds=SEGMENT_SECONDS):
+    """``(start, length)`` windows to transcribe; a length of None runs to the end."""
+    if not max_seconds or (duration is not None and duration <= max_seconds):
+        return [(0.0, None)]
+    if policy == "head" or duration is None:
+        return [(0.0, max_seconds)]
+    if policy != "spread":
+        raise ValueError(f"Unknown sampling policy '{policy}', expected 'head' or 'spread'")
+
+    count = max(1, int(max_seconds // segment_seconds))
+    length = max_seconds / count
+    if count == 1:
+        return [((duration - length) / 2, length)]
+    step = (duration - length) / (count - 1)
+    return [(i * step, length) for i in range(count)]
+
+
+def iter_audio_chunks(source, sample_rate=16000, chunk_duration=30, overlap_duration=0, start=0.0, duration=None):
+    """Decode the audio track of ``source`` straight to mono float32 chunks with ffmpeg.
+
+    Chunks have the same layout as chunk_audio_tensor() but are produced while
+    ffmpeg is still decoding, without writing an intermediate WAV. ``start``
+    and ``duration`` (seconds) restrict decoding to one window of the file.
+    """
+    exe = _ffmpeg_exe()
+    if exe is None:
+        raise RuntimeError("ffmpeg is not available")
+
+    samples_per_chunk = chunk_duration * sample_rate
+    overlap = int(overlap_duration * sample_rate)
+    if overlap >= samples_per_chunk:
+        raise ValueError("overlap_duration must be shorter than chunk_duration")
+
+    window = (["-ss", f"{start:.3f}"] if start else []) + ["-i", source] + (["-t", f"{duration:.3f}"] if duration else [])
+    cmd = [exe, "-nostdin", "-v", "error"] + window + ["-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "pipe:1"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    carry = np.empty(0, dtype=np.float32)
+    try:
+        while True:
+            data = _read_exact(proc.stdout, (samples_per_chunk - len(carry)) * 4)
+            data = data[:len(data) - len(data) % 4]
+            if not data and (len(carry) <= overlap):
+                break
+
+            chunk = np.concatenate([carry, np.frombuffer(data, dtype=np.float32)])
+            complete = len(chunk) == samples_per_chunk
+            carry = chunk[samples_per_chunk - overlap:] if complete else carry[:0]
+            if not complete:
+                chunk = np.pad(chunk, (0, samples_per_chunk - len(chunk)))
+            yield torch.from_numpy(chunk)
+
+            if not complete:
+                break
+
+        stderr = proc.stderr.read().decode("utf-8", "replace").strip()
+        if proc.wait() != 0:
+            raise RuntimeError(stderr or f"ffmpeg exited with code {proc.returncode}")
+    finally:
+        # Also reached when the consumer stops early: do not leave ffmpeg running
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+def overlap_word_limit(overlap_duration, words_per_second=SPEECH_WORDS_PER_SECOND):
+    """Most words two chunks overlapping by ``overlap_duration`` seconds can both transcribe.
+
+    Only words lying wholly inside the overlap are heard by both chunks,
+    which is about one fewer than the overlap spans.
+    """
+    return max(0, int(overlap_duration * words_per_second) - 1)
+
+
+def merge_overlapping_transcripts(transcripts, max_overlap_words):
+    """Join chunk transcripts, dropping up to ``max_overlap_words`` words repeated across each boundary.
+
+    A longer limit than the overlap can hold would also drop genuinely
+    repeated speech ("لا لا" followed by "لا لا").
+    """
+    merged = []
+    for text in transcripts:
+        words = text.split()
+        longest = min(max_overlap_words, len(merged), len(words))
+        for size in range(longest, 0, -1):
+            if merged[-size:] == words[:size]:
+                words = words[size:]
+                break
+        merged.extend(words)
+    return " ".join(merged)
+
+
+def _hypothesis_text(hypothesis):
+    # Hybrid RNNT/CTC models return Hypothesis objects, older NeMo versions plain strings
+    return hypothesis.text if hasattr(hypothesis, "text") else str(hypothesis)
+
+
 class VideoToAudioProcessor:
-    def __init__(self, device=None, target_sample_rate=16000, chunk_duration=30):
+    def __init__(self, device=None, target_sample_rate=16000, chunk_duration=30, overlap_duration=1.0, batch_size=8,
+                 max_seconds=MAX_SECONDS, sampling=SAMPLING, segment_seconds=SEGMENT_SECONDS):
         self.target_sample_rate = target_sample_rate
         self.chunk_duration = chunk_duration
+        self.overlap_duration = overlap_duration
+        self.batch_size = batch_size
+        self.max_seconds = max_seconds
+        self.sampling = sampling
+        self.segment_seconds = segment_seconds
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.resampler = torchaudio.transforms.Resample(
             orig_freq=44100,
             new_freq=target_sample_rate
         ).to(self.device)
 
-        nvidia_model = "nvidia/stt_ar_fastconformer_hybrid_large_pcd_v1.0"
-        self.asr_model = nemo_asr.models.EncDecHybridRNNTCTCBPEModel.from_pretrained(
-            model_name=nvidia_model
-        ).to(self.device)
+        # Shared across processors, the checkpoint is loaded once per process
+        self.asr_model = model_registry.get("nemo_asr")
 
     def extract_audio(self, video_path, audio_path):
+        from moviepy.editor import VideoFileClip
+
         try:
             video = VideoFileClip(video_path)
             video.audio.write_audiofile(audio_path, verbose=False, logger=None)
@@ -68,61 +250,187 @@ class VideoToAudioProcessor:
 
         return waveform.squeeze(0)
 
-    def transcribe_video(self, video_path):
-        temp_audio_dir = "./vtt/temp_audio"
-        os.makedirs(temp_audio_dir, exist_ok=True)
-
-        video_file = os.path.basename(video_path)
-        audio_filename = os.path.splitext(video_file)[0] + ".wav"
-        audio_path = os.path.join(temp_audio_dir, audio_filename)
-
-        if not os.path.exists(audio_path):
+    def transcribe_video(self, video_path, on_partial=None):
+        """Transcript of ``video_path``; ``on_partial(text)`` receives the transcript so far as it grows."""
+        if _ffmpeg_exe() is not None:
+            transcript = ""
+            for transcript in self.stream_file(video_path):
+                if on_partial is not None:
+                    on_partial(transcript)
+            return transcript
+
+        # Legacy path: extract a WAV with moviepy into a private temp dir
+        with tempfile.TemporaryDirectory() as temp_audio_dir, metrics.track("audio"):
+            audio_path = os.path.join(temp_audio_dir, "audio.wav")
             success = self.extract_audio(video_path, audio_path)
             if not success:
-                return "[ERROR extracting audio]"
-
-        processed_audio = self.preprocess_audio(audio_path)
-        if processed_audio is None:
-            return "[ERROR preprocessing audio]"
+                raise RuntimeError(f"Could not extract audio from {video_path}")
 
-        chunks = chunk_audio_tensor(processed_audio, self.target_sample_rate, self.chunk_duration)
+            processed_audio = self.preprocess_audio(audio_path)
+            if processed_audio is None:
+                raise RuntimeError(f"Could not load the audio of {video_path}")
 
-        full_transcription = ""
+            # Without ffmpeg to seek with, long videos are always cut to their beginning
+            if self.max_seconds:
+                processed_audio = processed_audio[:int(self.max_seconds * self.target_sample_rate)]
+            chunks = chunk_audio_tensor(processed_audio, self.target_sample_rate, self.chunk_duration, self.overlap_duration)
 
-        for chunk in chunks:
-            hash_value = hash(chunk.cpu().numpy().tobytes())
-            temp_dir = tempfile.gettempdir()
-            temp_wav_path = os.path.join(temp_dir, f"temp_{abs(hash_value)}.wav")
-            torchaudio.save(temp_wav_path, chunk.unsqueeze(0).cpu(), self.target_sample_rate)
+        try:
+            transcripts = self.transcribe_chunks(chunks)
+        except Exception as e:
+            print(f"[ERROR] Transcription failed: {e}")
+            transcripts = []
+
+        return merge_overlapping_transcripts(transcripts, overlap_word_limit(self.overlap_duration))
+
+    def transcribe_file(self, media_path):
+        """Decode and transcribe ``media_path`` batch by batch while ffmpeg keeps decoding."""
+        transcript = ""
+        for transcript in self.stream_file(media_path):
+            pass
+        return transcript
+
+    def stream_file(self, media_path):
+        """Yield the transcript so far after every batch of chunks.
+
+        A decoder thread feeds a bounded queue, so memory does not grow with
+        the length of the recording. Recordings longer than ``max_seconds``
+        are cut down to the windows chosen by plan_segments(). Closing the
+        generator early stops ffmpeg.
+        """
+        duration = media_duration(media_path) if self.max_seconds else None
+        segments = plan_segments(duration, self.max_seconds, self.sampling, self.segment_seconds)
+        chunks = queue.Queue(maxsize=self.batch_size * 2)
+        stop = threading.Event()
+        done = object()
+        errors = []
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
 
+        def decode():
+            # Only the reads from ffmpeg count as "audio": put() blocks while
+            # ASR catches up, and that wait is already in the "asr" stage
+            seconds, items = 0.0, 0
             try:
-                transcription = self.asr_model.transcribe([temp_wav_path], verbose=False)[0].text
-                full_transcription += transcription + " "
+                for segment, (start, length) in enumerate(segments):
+                    audio = iter_audio_chunks(media_path, self.target_sample_rate, self.chunk_duration,
+                                              self.overlap_duration, start=start, duration=length)
+                    with closing(audio):
+                        while True:
+                            started = time.perf_counter()
+                            chunk = next(audio, done)
+                            seconds += time.perf_counter() - started
+                            if chunk is done:
+                                break
+                            items += 1
+                            if not put((segment, chunk)):
+                                return
             except Exception as e:
-                print(f"[ERROR] Transcription failed: {e}")
-
-            os.remove(temp_wav_path)
-        os.remove(audio_path)
-
-        return full_transcription.strip()
+                errors.append(e)
+            finally:
+                metrics.REGISTRY.add("audio", seconds, items)
+                put(done)
+
+        decoder = threading.Thread(target=decode, daemon=True)
+        decoder.start()
+
+        # Segments are transcribed separately and joined line by line
+        overlap_words = overlap_word_limit(self.overlap_duration)
+        transcripts = [[] for _ in segments]
+        batch = []
+        finished = False
+        try:
+            while not finished:
+                item = chunks.get()
+                finished = item is done
+                if not finished:
+                    batch.append(item)
+                if batch and (finished or len(batch) >= self.batch_size):
+                    try:
+                        texts = self.transcribe_chunks([chunk for _, chunk in batch])
+                        for (segment, _), text in zip(batch, texts):
+                            transcripts[segment].append(text)
+                    except Exception as e:
+                        print(f"[ERROR] Transcription failed: {e}")
+                    batch = []
+                    yield "\n".join(merge_overlapping_transcripts(t, overlap_words) for t in transcripts if t)
+        finally:
+            stop.set()
+            decoder.join()
+
+        if errors:
+            # A recording that decoded partway keeps its transcript; one that
+            # gave no audio at all fails like any other unreadable file
+            if not any(transcripts):
+                raise RuntimeError(f"Audio extraction failed: {errors[0]}") from errors[0]
+            print(f"[ERROR] Audio extraction failed: {errors[0]}")
+
+    def transcribe_chunks(self, chunks):
+        """Transcribe all chunks in batched transcribe() calls, returning one text per chunk."""
+        if not chunks:
+            return []
+
+        arrays = [np.asarray(chunk.cpu()) if torch.is_tensor(chunk) else np.asarray(chunk) for chunk in chunks]
+        with metrics.track("asr", len(chunks)):
+            try:
+                # NeMo >= 2.0 accepts in-memory 16 kHz waveforms directly
+                hypotheses = self.asr_model.transcribe(arrays, batch_size=self.batch_size, verbose=False)
+            except (TypeError, ValueError, AttributeError):
+                hypotheses = self._transcribe_chunk_files(chunks)
+
+        if isinstance(hypotheses, tuple):
+            hypotheses = hypotheses[0]
+        return [_hypothesis_text(h) for h in hypotheses]
+
+    def _transcribe_chunk_files(self, chunks):
+        # Older NeMo only takes paths: write every chunk first, then transcribe them in one call
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for i, chunk in enumerate(chunks):
+                path = os.path.join(temp_dir, f"chunk_{i:05d}.wav")
+                torchaudio.save(path, torch.as_tensor(chunk).unsqueeze(0).cpu(), self.target_sample_rate)
+                paths.append(path)
+            return self.asr_model.transcribe(paths, batch_size=self.batch_size, verbose=False)
         
-def get_transcript(uploaded_file):
-    import tempfile
-    import shutil
-
+def get_transcript(uploaded_file, on_partial=None):
+    # Repeat uploads of the same bytes are served from the media result cache;
+    # on_partial(text) is called with the transcript so far while it is produced
+    return result_cache.cached_extraction(
+        uploaded_file, "video", ASR_MODEL_ID,
+        lambda: _get_transcript(uploaded_file, on_partial),
+    )
+
+
+def _get_transcript(uploaded_file, on_partial=None):
+    # Paths and files opened from disk (the batch CLI) are decoded in place.
+    # Browser uploads are always spooled to a private temp file, because MP4
+    # demuxing needs to seek; their .name is a client-supplied filename, not a
+    # server path. The copy is streamed, so it costs disk space rather than memory.
+    if isinstance(uploaded_file, str):
+        return VideoToAudioProcessor().transcribe_video(uploaded_file, on_partial)
+    path = getattr(uploaded_file, "name", None)
+    if isinstance(uploaded_file, (io.BufferedReader, io.FileIO)) and isinstance(path, str) and os.path.isfile(path):
+        return VideoToAudioProcessor().transcribe_video(path, on_partial)
+
+    suffix = os.path.splitext(path)[1] if isinstance(path, str) else ".mp4"
     temp_video_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_video:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix or ".mp4") as temp_video:
             shutil.copyfileobj(uploaded_file, temp_video)
             temp_video_path = temp_video.name
 
         processor = VideoToAudioProcessor()
-        transcript = processor.transcribe_video(temp_video_path)
+        transcript = processor.transcribe_video(temp_video_path, on_partial)
 
     finally:
         if temp_video_path and os.path.exists(temp_video_path):
             os.remove(temp_video_path)
 
     return transcript
-
-